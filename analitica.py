@@ -0,0 +1,225 @@
+"""Armazém colunar em memória para as consultas de análise do painel admin.
+
+Cada voto ocupa 11 bytes em quatro colunas compactas (array):
+tipo (uint8), dia (uint32, ordinal da data), minuto do dia (uint16) e
+número sequencial (uint32, necessário para manter a semântica MAX(sequential_number)
+das estatísticas existentes). Com NumPy instalado as consultas são vetorizadas
+sobre as mesmas memórias (sem cópia); sem NumPy usa-se Python puro.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, time as dt_time
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 'I' tem 4 bytes em quase todas as plataformas; caso contrário usar 'L'
+_U32 = 'I' if array('I').itemsize == 4 else 'L'
+
+
+def dia_ordinal(valor):
+    """Converter data (str ISO ou date) em ordinal"""
+    if isinstance(valor, date):
+        return valor.toordinal()
+    return date.fromisoformat(str(valor)[:10]).toordinal()
+
+
+def minuto_do_dia(valor):
+    """Converter hora ('HH:MM' ou time) em minutos desde a meia-noite"""
+    if isinstance(valor, dt_time):
+        return valor.hour * 60 + valor.minute
+    valor = str(valor)
+    return int(valor[:2]) * 60 + int(valor[3:5])
+
+
+class VotosColunares:
+    """Votos guardados em colunas compactas, com consultas por intervalo de dias"""
+
+    def __init__(self):
+        self.tipo = array('B')
+        self.dia = array(_U32)
+        self.minuto = array('H')
+        self.seq = array(_U32)
+        self.ultimo_id = 0
+        self.ordenado = True
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tipo)
+
+    def adicionar(self, id, tipo, dia, minuto, seq):
+        """Acrescentar um voto (dia em ordinal, minuto desde a meia-noite)"""
+        with self._lock:
+            if id <= self.ultimo_id:
+                return
+            if self.dia and dia < self.dia[-1]:
+                self.ordenado = False
+            self.tipo.append(tipo)
+            self.dia.append(dia)
+            self.minuto.append(minuto)
+            self.seq.append(seq)
+            self.ultimo_id = id
+
+    def carregar(self, cursor, tamanho_lote=50000):
+        """Ler linhas (id, tipo, data, hora, seq) de um cursor ordenado por id, em lotes"""
+        # Datas e horas repetem-se muito: converter cada valor distinto uma só vez
+        dias = {}
+        minutos = {}
+        anterior = self.dia[-1] if self.dia else 0
+        ordenado = True
+        while True:
+            rows = cursor.fetchmany(tamanho_lote)
+            if not rows:
+                break
+            tipo, dia, minuto, seq = array('B'), array(_U32), array('H'), array(_U32)
+            for row in rows:
+                d = dias.get(row[2])
+                if d is None:
+                    d = dias[row[2]] = dia_ordinal(row[2])
+                m = minutos.get(row[3])
+                if m is None:
+                    m = minutos[row[3]] = minuto_do_dia(row[3])
+                if d < anterior:
+                    ordenado = False
+                anterior = d
+                tipo.append(row[1])
+                dia.append(d)
+                minuto.append(m)
+                seq.append(row[4])
+
+            with self._lock:
+                # adicionar() pode ter acrescentado entretanto as primeiras linhas do lote
+                k = 0
+                while k < len(rows) and rows[k][0] <= self.ultimo_id:
+                    k += 1
+                if k == len(rows):
+                    continue
+                if k:
+                    tipo, dia, minuto, seq = tipo[k:], dia[k:], minuto[k:], seq[k:]
+                if not ordenado:
+                    self.ordenado = False
+                self.tipo.extend(tipo)
+                self.dia.extend(dia)
+                self.minuto.extend(minuto)
+                self.seq.extend(seq)
+                self.ultimo_id = rows[-1][0]
+
+    def memoria(self):
+        """Bytes ocupados pelas colunas"""
+        return sum(col.itemsize * len(col) for col in (self.tipo, self.dia, self.minuto, self.seq))
+
+    def _intervalo(self, inicio, fim):
+        """Devolver (a, b, máscara) para os votos com inicio <= dia <= fim"""
+        n = len(self.tipo)
+        if inicio is None and fim is None:
+            return 0, n, None
+        inicio = 0 if inicio is None else inicio
+        fim = 2 ** 32 - 1 if fim is None else fim
+        if self.ordenado:
+            if np is not None:
+                dias = np.frombuffer(self.dia, dtype=np.uint32, count=n)
+                return int(np.searchsorted(dias, inicio, 'left')), int(np.searchsorted(dias, fim, 'right')), None
+            return bisect_left(self.dia, inicio, 0, n), bisect_right(self.dia, fim, 0, n), None
+        return 0, n, (inicio, fim)
+
+    def _consultar(self, funcao, inicio, fim):
+        """Aplicar funcao(tipo, dia, minuto, seq) a vistas NumPy das colunas.
+
+        As vistas partilham a memória dos arrays, que não podem crescer enquanto
+        estiverem exportadas: por isso a consulta corre toda dentro do lock e
+        funcao tem de devolver apenas valores Python.
+        """
+        with self._lock:
+            return funcao(*self._colunas(inicio, fim))
+
+    def _colunas(self, inicio, fim):
+        """Vistas NumPy das colunas no intervalo pedido (chamar com o lock)"""
+        a, b, filtro = self._intervalo(inicio, fim)
+        n = len(self.tipo)
+        tipo = np.frombuffer(self.tipo, dtype=np.uint8, count=n)[a:b]
+        dia = np.frombuffer(self.dia, dtype=np.uint32, count=n)[a:b]
+        minuto = np.frombuffer(self.minuto, dtype=np.uint16, count=n)[a:b]
+        seq = np.frombuffer(self.seq, dtype=np.uint32, count=n)[a:b]
+        if filtro is not None:
+            mask = (dia >= filtro[0]) & (dia <= filtro[1])
+            return tipo[mask], dia[mask], minuto[mask], seq[mask]
+        return tipo, dia, minuto, seq
+
+    def _linhas(self, inicio, fim):
+        """Iterar (tipo, dia, minuto, seq) no intervalo pedido (sem NumPy)"""
+        with self._lock:
+            a, b, filtro = self._intervalo(inicio, fim)
+        for i in range(a, b):
+            dia = self.dia[i]
+            if filtro is None or filtro[0] <= dia <= filtro[1]:
+                yield self.tipo[i], dia, self.minuto[i], self.seq[i]
+
+    def contar(self, inicio=None, fim=None):
+        """Número de votos entre dois dias (inclusive)"""
+        if np is not None:
+            return self._consultar(lambda tipo, dia, minuto, seq: int(len(tipo)), inicio, fim)
+        return sum(1 for _ in self._linhas(inicio, fim))
+
+    def distribuicao(self, inicio=None, fim=None):
+        """Contagem de votos por tipo"""
+        if np is not None:
+            return self._consultar(_np_distribuicao, inicio, fim)
+        result = {}
+        for tipo, _, _, _ in self._linhas(inicio, fim):
+            result[tipo] = result.get(tipo, 0) + 1
+        return result
+
+    def histograma_horario(self, inicio=None, fim=None):
+        """Contagem de votos por hora do dia (24 posições)"""
+        if np is not None:
+            return self._consultar(_np_histograma_horario, inicio, fim)
+        result = [0] * 24
+        for _, _, minuto, _ in self._linhas(inicio, fim):
+            result[minuto // 60] += 1
+        return result
+
+    def max_seq_por_tipo(self, inicio=None, fim=None):
+        """MAX(sequential_number) por tipo"""
+        if np is not None:
+            return self._consultar(_np_max_seq_por_tipo, inicio, fim)
+        result = {}
+        for tipo, _, _, seq in self._linhas(inicio, fim):
+            if seq > result.get(tipo, 0):
+                result[tipo] = seq
+        return result
+
+    def max_seq_por_dia_tipo(self, inicio, fim):
+        """MAX(sequential_number) por (dia, tipo), como lista de (dia, tipo, total)"""
+        if np is not None:
+            return self._consultar(
+                lambda tipo, dia, minuto, seq: _np_max_seq_por_dia_tipo(tipo, dia, seq, inicio, fim),
+                inicio, fim)
+        result = {}
+        for tipo, dia, _, seq in self._linhas(inicio, fim):
+            if seq > result.get((dia, tipo), 0):
+                result[(dia, tipo)] = seq
+        return [(dia, tipo, total) for (dia, tipo), total in sorted(result.items())]
+
+
+def _np_distribuicao(tipo, dia, minuto, seq):
+    contagens = np.bincount(tipo, minlength=256)
+    return {int(t): int(c) for t, c in enumerate(contagens) if c}
+
+
+def _np_histograma_horario(tipo, dia, minuto, seq):
+    return np.bincount(minuto // 60, minlength=24)[:24].tolist()
+
+
+def _np_max_seq_por_tipo(tipo, dia, minuto, seq):
+    presentes = np.flatnonzero(np.bincount(tipo, minlength=256))
+    return {int(t): int(seq[tipo == t].max()) for t in presentes}
+
+
+def _np_max_seq_por_dia_tipo(tipo, dia, seq, inicio, fim):
+    chave = (dia.astype(np.int64) - inicio) * 256 + tipo
+    result = np.zeros((fim - inicio + 1) * 256, dtype=np.uint32)
+    np.maximum.at(result, chave, seq)
+    return [(inicio + int(k) // 256, int(k) % 256, int(result[k])) for k in np.flatnonzero(result)]
@@ -1,11 +1,50 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+import time
+
+_ARRANQUE_T0 = time.perf_counter()
+
+import click
+from flask import Flask, Response, g, has_app_context, render_template, request, jsonify, session, redirect, url_for
 import sqlite3
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, time as dt_time, timedelta, timezone
+from decimal import Decimal
+import gzip
+import hashlib
+import json
+import mimetypes
 import os
+import re
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import queue
 from functools import wraps
+from zoneinfo import ZoneInfo
+from werkzeug.exceptions import NotFound
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import check_password_hash, generate_password_hash, safe_join
+
+from estado_partilhado import EstadoMemoria, criar_estado
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 app = Flask(__name__)
-app.secret_key = 'satisfacao_admin_secret_2026'
+app.secret_key = os.environ.get('SECRET_KEY', 'satisfacao_admin_secret_2026')
+
+# No Render o pedido chega através de um proxy (IP real em X-Forwarded-For); sem proxy
+# à frente, o cabeçalho vem do cliente e não pode ser usado para identificar o IP
+PROXY_HOPS = int(os.environ.get('PROXY_HOPS', 1 if os.environ.get('RENDER') else 0))
+if PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS)
 
 # Usar SQLite localmente ou PostgreSQL no cloud
 DATABASE_URL = os.environ.get('DATABASE_URL')
@@ -14,95 +53,1009 @@ if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
 
 if DATABASE_URL:
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
+    # psycopg2 só é importado quando o pool é criado (arranque a frio mais rápido)
     DB_TYPE = 'postgres'
 else:
     DATABASE = 'satisfacao.db'
     DB_TYPE = 'sqlite'
+# Segundos que uma escrita SQLite espera por um lock (manutenção, backup, outro worker)
+SQLITE_TIMEOUT = float(os.environ.get('SQLITE_TIMEOUT', 30))
+# WAL: leituras (integridade, backup, painel) não bloqueiam os inserts do quiosque
+SQLITE_WAL = os.environ.get('SQLITE_WAL', '1') == '1'
+
+def _migrar_avaliacoes(cursor):
+    """Acrescentar a BDs antigas a coluna voto_id (id gerado no quiosque, evita votos repetidos)"""
+    if DB_TYPE == 'sqlite':
+        cursor.execute('PRAGMA table_info(avaliacoes)')
+        if 'voto_id' not in [row[1] for row in cursor.fetchall()]:
+            try:
+                cursor.execute('ALTER TABLE avaliacoes ADD COLUMN voto_id TEXT')
+            except sqlite3.OperationalError:
+                pass  # outro worker acrescentou-a entretanto
+    else:
+        cursor.execute('ALTER TABLE avaliacoes ADD COLUMN IF NOT EXISTS voto_id TEXT')
+    # Único quando existe; os votos sem id (NULL) não colidem
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_avaliacoes_voto_id
+        ON avaliacoes (voto_id)
+    ''')
+
+def _migrar_opcoes(cursor):
+    """Acrescentar a BDs antigas a coluna positiva (conta para a taxa de satisfação)"""
+    if DB_TYPE == 'sqlite':
+        cursor.execute('PRAGMA table_info(survey_options)')
+        existe = 'positiva' in [row[1] for row in cursor.fetchall()]
+    else:
+        cursor.execute('''
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'survey_options' AND column_name = 'positiva'
+        ''')
+        existe = cursor.fetchone() is not None
+    if existe:
+        return
+    if DB_TYPE == 'sqlite':
+        try:
+            cursor.execute('ALTER TABLE survey_options ADD COLUMN positiva INTEGER NOT NULL DEFAULT 0')
+        except sqlite3.OperationalError:
+            return  # outro worker acrescentou-a entretanto
+    else:
+        cursor.execute('ALTER TABLE survey_options ADD COLUMN IF NOT EXISTS positiva INTEGER NOT NULL DEFAULT 0')
+    # A taxa antiga era Muito Satisfeito + Satisfeito
+    cursor.execute('UPDATE survey_options SET positiva = 1 WHERE id IN (1, 2)')
+
+def _semear_contadores_dia(cursor):
+    """Preencher contadores_dia de ontem e hoje a partir dos votos (BDs antigas ou restauradas)"""
+    desde = (agora_local().date() - timedelta(days=1)).isoformat()
+    if DB_TYPE == 'sqlite':
+        cursor.execute('''
+            INSERT INTO contadores_dia (avaliacao_date, tipo, ultimo)
+            SELECT avaliacao_date, tipo, MAX(sequential_number)
+            FROM avaliacoes
+            WHERE avaliacao_date >= ?
+            GROUP BY avaliacao_date, tipo
+            ON CONFLICT (avaliacao_date, tipo) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo)
+        ''', (desde,))
+    else:
+        cursor.execute('''
+            INSERT INTO contadores_dia (avaliacao_date, tipo, ultimo)
+            SELECT avaliacao_date, tipo, MAX(sequential_number)
+            FROM avaliacoes
+            WHERE avaliacao_date >= %s
+            GROUP BY avaliacao_date, tipo
+            ON CONFLICT (avaliacao_date, tipo) DO UPDATE SET ultimo = GREATEST(contadores_dia.ultimo, EXCLUDED.ultimo)
+        ''', (desde,))
 
 def init_db():
-    """Inicializar base de dados"""
+    """Inicializar base de dados (tabelas e índices em falta)"""
     if DB_TYPE == 'sqlite':
-        if not os.path.exists(DATABASE):
-            conn = sqlite3.connect(DATABASE)
+        conn = sqlite3.connect(DATABASE, timeout=SQLITE_TIMEOUT)
+        cursor = conn.cursor()
+        if SQLITE_WAL:
+            # Fica gravado no ficheiro: basta uma vez, mas é idempotente
+            cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS avaliacoes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo INTEGER NOT NULL,
+                avaliacao_date DATE NOT NULL,
+                avaliacao_time TIME NOT NULL,
+                sequential_number INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                voto_id TEXT
+            )
+        ''')
+        _migrar_avaliacoes(cursor)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_avaliacoes_date_id
+            ON avaliacoes (avaliacao_date, id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_avaliacoes_date_seq
+            ON avaliacoes (avaliacao_date, sequential_number)
+        ''')
+        # Último número sequencial por (dia, tipo), atualizado na transação de cada voto
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS contadores_dia (
+                avaliacao_date DATE NOT NULL,
+                tipo INTEGER NOT NULL,
+                ultimo INTEGER NOT NULL,
+                PRIMARY KEY (avaliacao_date, tipo)
+            )
+        ''')
+        _semear_contadores_dia(cursor)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS relatorios (
+                nome TEXT PRIMARY KEY,
+                dados TEXT NOT NULL,
+                gerado_em TIMESTAMP NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS utilizadores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL UNIQUE,
+                password_hash TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sessoes (
+                token_hash TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                criada_em INTEGER NOT NULL,
+                expira_em INTEGER NOT NULL,
+                revogada INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS survey_options (
+                id INTEGER PRIMARY KEY,
+                nome TEXT NOT NULL,
+                emoji TEXT NOT NULL DEFAULT '',
+                classe TEXT NOT NULL DEFAULT '',
+                ordem INTEGER NOT NULL DEFAULT 0,
+                ativo INTEGER NOT NULL DEFAULT 1,
+                positiva INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        _migrar_opcoes(cursor)
+        _criar_admin_inicial(cursor)
+        _criar_opcoes_iniciais(cursor)
+        conn.commit()
+        conn.close()
+    else:
+        try:
+            conn = get_db()
             cursor = conn.cursor()
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS avaliacoes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id SERIAL PRIMARY KEY,
                     tipo INTEGER NOT NULL,
                     avaliacao_date DATE NOT NULL,
                     avaliacao_time TIME NOT NULL,
                     sequential_number INTEGER NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    voto_id TEXT
                 )
             ''')
-            conn.commit()
-            conn.close()
-    else:
-        try:
-            conn = psycopg2.connect(DATABASE_URL)
-            cursor = conn.cursor()
+            _migrar_avaliacoes(cursor)
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS avaliacoes (
-                    id SERIAL PRIMARY KEY,
-                    tipo INTEGER NOT NULL,
+                CREATE INDEX IF NOT EXISTS idx_avaliacoes_date_id
+                ON avaliacoes (avaliacao_date, id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_avaliacoes_date_seq
+                ON avaliacoes (avaliacao_date, sequential_number)
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS contadores_dia (
                     avaliacao_date DATE NOT NULL,
-                    avaliacao_time TIME NOT NULL,
-                    sequential_number INTEGER NOT NULL,
+                    tipo INTEGER NOT NULL,
+                    ultimo INTEGER NOT NULL,
+                    PRIMARY KEY (avaliacao_date, tipo)
+                )
+            ''')
+            _semear_contadores_dia(cursor)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS relatorios (
+                    nome TEXT PRIMARY KEY,
+                    dados TEXT NOT NULL,
+                    gerado_em TIMESTAMP NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS utilizadores (
+                    id SERIAL PRIMARY KEY,
+                    username TEXT NOT NULL UNIQUE,
+                    password_hash TEXT NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sessoes (
+                    token_hash TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    criada_em BIGINT NOT NULL,
+                    expira_em BIGINT NOT NULL,
+                    revogada INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS survey_options (
+                    id INTEGER PRIMARY KEY,
+                    nome TEXT NOT NULL,
+                    emoji TEXT NOT NULL DEFAULT '',
+                    classe TEXT NOT NULL DEFAULT '',
+                    ordem INTEGER NOT NULL DEFAULT 0,
+                    ativo INTEGER NOT NULL DEFAULT 1,
+                    positiva INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            _migrar_opcoes(cursor)
+            _criar_admin_inicial(cursor)
+            _criar_opcoes_iniciais(cursor)
             conn.commit()
             conn.close()
         except Exception as e:
             print(f"Erro ao criar tabela: {e}")
 
+# Fuso horário do local: o servidor na cloud corre em UTC, o dia de negócio é o de Portugal
+SITE_TZ = ZoneInfo(os.environ.get('SITE_TZ', 'Europe/Lisbon'))
+_dia_cache = (None, None, 0.0)  # (dia, dia em ISO, timestamp da próxima meia-noite local)
+
+def agora_local():
+    """Data/hora atual no fuso do local"""
+    return datetime.now(SITE_TZ)
+
+def _dia_atual_cache():
+    """Dia de negócio em cache, recalculado só quando passa a meia-noite local"""
+    global _dia_cache
+    cache = _dia_cache
+    if time.time() >= cache[2]:
+        dia = agora_local().date()
+        meia_noite = datetime.combine(dia + timedelta(days=1), dt_time(0), tzinfo=SITE_TZ)
+        cache = _dia_cache = (dia, dia.isoformat(), meia_noite.timestamp())
+    return cache
+
+def dia_atual():
+    """Dia de negócio atual (date) no fuso do local"""
+    return _dia_atual_cache()[0]
+
+def dia_atual_iso():
+    """Dia de negócio atual em formato ISO (chave dos índices por data)"""
+    return _dia_atual_cache()[1]
+
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+DB_POOL_VERIFICAR = int(os.environ.get('DB_POOL_VERIFICAR', 30))  # testar conexões paradas há mais de N s
+_pool = None
+_pool_lock = threading.Lock()
+_devolvidas = {}  # id(conexão) -> instante em que voltou ao pool
+
+class _ConexaoPool:
+    """Conexão emprestada do pool: close() devolve-a em vez de a fechar"""
+    
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+    
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+    
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            if conn.closed:
+                _devolvidas.pop(id(conn), None)
+            else:
+                _devolvidas[id(conn)] = time.monotonic()
+            # putconn faz rollback de transações abertas e fecha conexões em estado desconhecido
+            self._pool.putconn(conn, close=bool(conn.closed))
+    
+    def __del__(self):
+        # Exceção antes do close() (fora de um pedido): devolver na mesma a conexão
+        try:
+            self.close()
+        except Exception:
+            pass
+
+def obter_pool():
+    """Criar (na primeira vez) o pool de conexões PostgreSQL"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from psycopg2.pool import ThreadedConnectionPool
+                _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DATABASE_URL)
+    return _pool
+
+def _conexao_valida(conn):
+    """Conexão do pool utilizável (as paradas há muito são testadas com SELECT 1)"""
+    from psycopg2.extensions import TRANSACTION_STATUS_UNKNOWN
+    
+    if conn.closed or conn.info.transaction_status == TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if time.monotonic() - _devolvidas.get(id(conn), 0) < DB_POOL_VERIFICAR:
+        return True
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
 def get_db():
-    """Obter conexão com base de dados"""
+    """Obter conexão com base de dados (devolvida no fim do pedido se não for fechada)"""
     if DB_TYPE == 'sqlite':
-        conn = sqlite3.connect(DATABASE)
+        conn = sqlite3.connect(DATABASE, timeout=SQLITE_TIMEOUT)
         conn.row_factory = sqlite3.Row
     else:
-        conn = psycopg2.connect(DATABASE_URL)
+        pool = obter_pool()
+        # Depois de um reinício do PostgreSQL as conexões do pool estão mortas: descartá-las
+        for tentativa in range(DB_POOL_MAX + 1):
+            raw = pool.getconn()
+            if tentativa == DB_POOL_MAX or _conexao_valida(raw):
+                break
+            _devolvidas.pop(id(raw), None)
+            pool.putconn(raw, close=True)
+        conn = _ConexaoPool(pool, raw)
+    if has_app_context():
+        g.setdefault('_conexoes', []).append(conn)
     return conn
 
-def get_sequential_number(tipo):
-    """Obter número sequencial global para hoje (não por tipo)"""
-    today = date.today().isoformat()
+@app.teardown_appcontext
+def _fechar_conexoes(exc):
+    """Fechar (devolver ao pool) as conexões que uma rota não fechou por causa de uma exceção"""
+    for conn in g.pop('_conexoes', ()):
+        conn.close()
+
+# Serialização JSON rápida: orjson se estiver instalado, senão json da biblioteca padrão
+def _json_padrao(valor):
+    """Converter tipos que o psycopg2 devolve e o JSON não conhece"""
+    if isinstance(valor, (datetime, date, dt_time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return int(valor) if valor == valor.to_integral_value() else float(valor)
+    raise TypeError(f'Tipo não serializável: {type(valor).__name__}')
+
+def _dumps_orjson(obj):
+    """Serializar para bytes JSON (orjson)"""
+    return orjson.dumps(obj, default=_json_padrao, option=orjson.OPT_NON_STR_KEYS)
+
+def _dumps_stdlib(obj):
+    """Serializar para bytes JSON (json da biblioteca padrão)"""
+    return json.dumps(obj, default=_json_padrao, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+dumps_json = _dumps_orjson if orjson is not None else _dumps_stdlib
+
+def resposta_json(obj, status=200):
+    """Resposta JSON sem passar pelo jsonify"""
+    return Response(dumps_json(obj), status=status, mimetype='application/json')
+
+def resposta_linhas(chave, rows, colunas, **extra):
+    """Responder com linhas da BD (tuplos): objetos, ou listas + colunas se ?formato=compacto"""
+    if request.args.get('formato') == 'compacto':
+        corpo = {'colunas': colunas, chave: rows}
+    else:
+        corpo = {chave: [dict(zip(colunas, row)) for row in rows]}
+    corpo.update(extra)
+    return resposta_json(corpo)
+
+def cursor_tuplos(conn):
+    """Cursor que devolve tuplos simples (sem sqlite3.Row), prontos a serializar"""
+    cursor = conn.cursor()
+    if DB_TYPE == 'sqlite':
+        cursor.row_factory = None
+    return cursor
+
+# Opções do inquérito (tabela survey_options) em cache: validação O(1) a cada voto
+OPCOES_CACHE_TTL = int(os.environ.get('OPCOES_CACHE_TTL', 60))   # segundos; alterações chegam já por pub/sub
+OPCOES_INICIAIS = [
+    (1, 'Muito Satisfeito', '😀', 'very-satisfied', 1, 1),
+    (2, 'Satisfeito', '🙂', 'satisfied', 2, 1),
+    (3, 'Insatisfeito', '😞', 'unsatisfied', 3, 0)
+]
+_opcoes = {'snapshot': None, 'carregado_em': 0.0}
+_opcoes_lock = threading.Lock()
+
+def _criar_opcoes_iniciais(cursor):
+    """Se a tabela estiver vazia, criar as três opções originais"""
+    cursor.execute('SELECT COUNT(*) FROM survey_options')
+    if cursor.fetchone()[0] > 0:
+        return
+    ph = '?' if DB_TYPE == 'sqlite' else '%s'
+    for opcao in OPCOES_INICIAIS:
+        cursor.execute(f'''
+            INSERT INTO survey_options (id, nome, emoji, classe, ordem, positiva) VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph})
+            ON CONFLICT (id) DO NOTHING
+        ''', opcao)
+
+def _carregar_opcoes():
+    """Ler survey_options e montar as estruturas de consulta"""
     conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, nome, emoji, classe, ordem, ativo, positiva FROM survey_options ORDER BY ordem, id')
+    rows = cursor.fetchall()
+    conn.close()
+    
+    lista = [{'id': row[0], 'nome': row[1], 'emoji': row[2], 'classe': row[3], 'ordem': row[4],
+              'ativo': bool(row[5]), 'positiva': bool(row[6])} for row in rows]
+    return {
+        'lista': lista,
+        'nomes': {opcao['id']: opcao['nome'] for opcao in lista},
+        'todas': tuple(opcao['id'] for opcao in lista),
+        'ativas': frozenset(opcao['id'] for opcao in lista if opcao['ativo']),
+        'ativas_ordem': tuple(opcao['id'] for opcao in lista if opcao['ativo'])
+    }
+
+def opcoes():
+    """Opções do inquérito (snapshot imutável, recarregado após invalidação ou OPCOES_CACHE_TTL s)"""
+    snapshot = _opcoes['snapshot']
+    if snapshot is not None and time.monotonic() - _opcoes['carregado_em'] < OPCOES_CACHE_TTL:
+        return snapshot
+    with _opcoes_lock:
+        if _opcoes['snapshot'] is None or time.monotonic() - _opcoes['carregado_em'] >= OPCOES_CACHE_TTL:
+            _opcoes['snapshot'] = _carregar_opcoes()
+            _opcoes['carregado_em'] = time.monotonic()
+        return _opcoes['snapshot']
+
+def opcao_valida(tipo):
+    """O tipo corresponde a uma opção ativa?"""
+    return isinstance(tipo, int) and tipo in opcoes()['ativas']
+
+def contagens_vazias():
+    """Dicionário {tipo: 0} com todas as opções, pela ordem configurada"""
+    return dict.fromkeys(opcoes()['todas'], 0)
+
+def invalidar_opcoes():
+    """Esquecer as opções em cache e as páginas que as mostram"""
+    _opcoes['carregado_em'] = 0.0
+    with _assets_lock:
+        for chave in [k for k in _assets if k.startswith('template:')]:
+            del _assets[chave]
+
+# Contadores do dia: com estado partilhado (ESTADO_URL) o número sequencial é um
+# INCR atómico e os contadores por tipo são máximos (ZADD GT), coerentes entre
+# workers e instâncias. Sem estado partilhado, ou se ele falhar, o número vem
+# da BD (MAX + 1 no próprio INSERT). Em qualquer caso cada voto atualiza a
+# tabela contadores_dia na sua transação, que dá os contadores sem GROUP BY.
+ESTADO_URL = os.environ.get('ESTADO_URL') or os.environ.get('REDIS_URL')
+estado = criar_estado(ESTADO_URL)
+ESTADO_PARTILHADO = not isinstance(estado, EstadoMemoria)
+CONTADORES_TTL_MS = 2 * 86400 * 1000  # as chaves de cada dia expiram sozinhas
+CANAL_VOTOS = 'satisfacao:votos'            # mensagem: id do voto novo
+CANAL_INVALIDAR = 'satisfacao:invalidar'    # mensagem: 'sessao:<hash>', 'utilizador:<nome>' ou 'opcoes:'
+_LOCK_SEQ_PG = 4207002  # pg_advisory_xact_lock que serializa o MAX + 1 entre workers
+
+def _chave_seq(dia):
+    return f'satisfacao:seq:{dia}'
+
+def _chave_tipos(dia):
+    return f'satisfacao:tipos:{dia}'
+
+def _contadores_da_bd(dia):
+    """Último número sequencial por tipo no dia indicado, lido de contadores_dia"""
+    conn = get_db()
+    cursor = conn.cursor()
     
     if DB_TYPE == 'sqlite':
-        cursor = conn.cursor()
+        cursor.execute('SELECT tipo, ultimo FROM contadores_dia WHERE avaliacao_date = ?', (dia,))
+    else:
+        cursor.execute('SELECT tipo, ultimo FROM contadores_dia WHERE avaliacao_date = %s', (dia,))
+    rows = cursor.fetchall()
+    conn.close()
+    
+    tipos = contagens_vazias()
+    for row in rows:
+        tipos[row[0]] = row[1]
+    return tipos
+
+def _semear_contadores(dia):
+    """Inicializar os contadores partilhados do dia a partir da BD (sem nunca os fazer descer)"""
+    tipos = _contadores_da_bd(dia)
+    # Os tipos primeiro: quem vê a chave seq já encontra os tipos semeados
+    estado.atualizar_maximos(_chave_tipos(dia), tipos)
+    estado.expire(_chave_tipos(dia), CONTADORES_TTL_MS // 1000)
+    estado.set(_chave_seq(dia), max(tipos.values(), default=0), nx=True, px=CONTADORES_TTL_MS)
+
+def _contadores_do_dia(dia):
+    """Último número sequencial por tipo (opções ativas) no dia indicado"""
+    tipos = opcoes()['ativas_ordem']
+    if ESTADO_PARTILHADO:
+        try:
+            maximos = estado.maximos(_chave_tipos(dia))
+            if not maximos:
+                _semear_contadores(dia)
+                maximos = estado.maximos(_chave_tipos(dia))
+            return {tipo: maximos.get(str(tipo), 0) for tipo in tipos}
+        except Exception as e:
+            print(f"Erro ao ler contadores do estado partilhado: {e}")
+    contadores = _contadores_da_bd(dia)
+    return {tipo: contadores.get(tipo, 0) for tipo in tipos}
+
+def _reservar_seq(dia):
+    """Próximo número do INCR partilhado, ou 0 (calcular na BD) sem estado partilhado ou se falhar"""
+    if not ESTADO_PARTILHADO:
+        return 0
+    try:
+        if estado.get(_chave_seq(dia)) is None:
+            _semear_contadores(dia)
+        return estado.incr(_chave_seq(dia))
+    except Exception as e:
+        print(f"Erro no estado partilhado, número sequencial calculado na BD: {e}")
+        return 0
+
+def _inserir_avaliacao(tipo, voto_id=None):
+    """Inserir avaliação e atualizar contadores; devolve None se o voto_id já foi gravado"""
+    now = agora_local()
+    avaliacao_date = now.date().isoformat()
+    avaliacao_time = now.strftime('%H:%M')
+    # created_at guarda o instante em UTC; avaliacao_date é o dia local derivado dele
+    created_at = now.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Se o INSERT falhar (ou o voto for repetido) o número fica por usar: lacuna, sem repetições
+    reservado = _reservar_seq(avaliacao_date)
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    # O número reservado só é usado se ainda não estiver na BD (p. ex. votos gravados
+    # com MAX + 1 enquanto o estado partilhado esteve em baixo); senão MAX + 1
+    if DB_TYPE == 'sqlite':
+        # O INSERT ... SELECT corre todo com o lock de escrita: MAX + 1 é atómico
         cursor.execute('''
-            SELECT MAX(sequential_number) as max_seq 
-            FROM avaliacoes 
-            WHERE avaliacao_date = ?
-        ''', (today,))
-        result = cursor.fetchone()
-        max_seq = result['max_seq'] if result['max_seq'] else 0
+            INSERT INTO avaliacoes (tipo, avaliacao_date, avaliacao_time, sequential_number, created_at, voto_id)
+            SELECT :tipo, :dia, :hora, CASE
+                WHEN :seq > 0 AND NOT EXISTS (
+                    SELECT 1 FROM avaliacoes WHERE avaliacao_date = :dia AND sequential_number = :seq
+                ) THEN :seq
+                ELSE (SELECT COALESCE(MAX(sequential_number), 0) + 1 FROM avaliacoes WHERE avaliacao_date = :dia)
+            END, :criado, :voto_id
+            WHERE true
+            ON CONFLICT (voto_id) DO NOTHING
+        ''', {'tipo': tipo, 'dia': avaliacao_date, 'hora': avaliacao_time, 'seq': reservado,
+              'criado': created_at, 'voto_id': voto_id})
+        if cursor.rowcount == 0:
+            conn.close()
+            return None
+        avaliacao_id = cursor.lastrowid
+        cursor.execute('SELECT sequential_number FROM avaliacoes WHERE id = ?', (avaliacao_id,))
+        sequential_number = cursor.fetchone()[0]
+        # Mesma transação (ainda com o lock de escrita): os contadores incluem este voto
+        cursor.execute('''
+            INSERT INTO contadores_dia (avaliacao_date, tipo, ultimo) VALUES (?, ?, ?)
+            ON CONFLICT (avaliacao_date, tipo) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo)
+        ''', (avaliacao_date, tipo, sequential_number))
+        cursor.execute('SELECT tipo, ultimo FROM contadores_dia WHERE avaliacao_date = ?', (avaliacao_date,))
+        contadores = dict(cursor.fetchall())
     else:
+        # Sempre: mesmo com número reservado, uma colisão cai no MAX + 1
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', (_LOCK_SEQ_PG,))
+        cursor.execute('''
+            INSERT INTO avaliacoes (tipo, avaliacao_date, avaliacao_time, sequential_number, created_at, voto_id)
+            SELECT %(tipo)s, %(dia)s, %(hora)s, CASE
+                WHEN %(seq)s > 0 AND NOT EXISTS (
+                    SELECT 1 FROM avaliacoes WHERE avaliacao_date = %(dia)s AND sequential_number = %(seq)s
+                ) THEN %(seq)s
+                ELSE (SELECT COALESCE(MAX(sequential_number), 0) + 1 FROM avaliacoes WHERE avaliacao_date = %(dia)s)
+            END, %(criado)s, %(voto_id)s
+            ON CONFLICT (voto_id) DO NOTHING
+            RETURNING id, sequential_number
+        ''', {'tipo': tipo, 'dia': avaliacao_date, 'hora': avaliacao_time, 'seq': reservado,
+              'criado': created_at, 'voto_id': voto_id})
+        row = cursor.fetchone()
+        if row is None:
+            conn.commit()
+            conn.close()
+            return None
+        avaliacao_id, sequential_number = row
+        cursor.execute('''
+            INSERT INTO contadores_dia (avaliacao_date, tipo, ultimo) VALUES (%s, %s, %s)
+            ON CONFLICT (avaliacao_date, tipo) DO UPDATE SET ultimo = GREATEST(contadores_dia.ultimo, EXCLUDED.ultimo)
+        ''', (avaliacao_date, tipo, sequential_number))
+        cursor.execute('SELECT tipo, ultimo FROM contadores_dia WHERE avaliacao_date = %s', (avaliacao_date,))
+        contadores = dict(cursor.fetchall())
+    
+    conn.commit()
+    conn.close()
+    
+    if ESTADO_PARTILHADO:
+        try:
+            if sequential_number != reservado:
+                # O INCR ficou atrás da BD: avançá-lo (pode saltar números, nunca repetir)
+                atual = int(estado.get(_chave_seq(avaliacao_date)) or 0)
+                if atual < sequential_number:
+                    estado.incr(_chave_seq(avaliacao_date), sequential_number - atual)
+            estado.atualizar_maximos(_chave_tipos(avaliacao_date), {tipo: sequential_number})
+        except Exception as e:
+            print(f"Erro ao atualizar contadores no estado partilhado: {e}")
+    
+    stats = {t: contadores.get(t, 0) for t in opcoes()['ativas_ordem']}
+    registo = obter_registo()
+    if registo is not None:
+        try:
+            registo.acrescentar(avaliacao_id, int(now.timestamp()), now.date().toordinal(),
+                                now.hour * 60 + now.minute, tipo, sequential_number)
+        except Exception as e:
+            # O voto já está na BD; a verificação do registo mostra a falta
+            print(f"Erro ao escrever no registo de eventos: {e}")
+    try:
+        estado.publish(CANAL_VOTOS, avaliacao_id)
+    except Exception as e:
+        print(f"Erro ao publicar voto no estado partilhado: {e}")
+    
+    # Acrescentar ao armazém colunar se não houver lacunas (outros workers)
+    store = _analitica
+    if store is not None and avaliacao_id == store.ultimo_id + 1:
+        store.adicionar(avaliacao_id, tipo, now.date().toordinal(), now.hour * 60 + now.minute, sequential_number)
+    
+    return sequential_number, avaliacao_date, avaliacao_time, stats
+
+# Armazém colunar opcional para as análises do painel admin (ANALYTICS_STORE=1)
+ANALYTICS_STORE = os.environ.get('ANALYTICS_STORE') == '1'
+_analitica = None
+_analitica_lock = threading.Lock()
+
+def obter_analitica():
+    """Armazém colunar carregado e sincronizado com a BD (None se desativado)"""
+    global _analitica
+    if not ANALYTICS_STORE:
+        return None
+    
+    with _analitica_lock:
+        if _analitica is None:
+            from analitica import VotosColunares
+            store = VotosColunares()
+        else:
+            store = _analitica
+        
+        # Primeira vez: leitura completa em lotes; depois só as linhas novas
+        conn = get_db()
         cursor = conn.cursor()
+        if DB_TYPE == 'sqlite':
+            cursor.execute('''
+                SELECT id, tipo, avaliacao_date, avaliacao_time, sequential_number
+                FROM avaliacoes
+                WHERE id > ?
+                ORDER BY id
+            ''', (store.ultimo_id,))
+        else:
+            cursor.execute('''
+                SELECT id, tipo, avaliacao_date, avaliacao_time, sequential_number
+                FROM avaliacoes
+                WHERE id > %s
+                ORDER BY id
+            ''', (store.ultimo_id,))
+        store.carregar(cursor)
+        conn.close()
+        
+        _analitica = store
+    return store
+
+# Registo de eventos só de acréscimo (EVENTOS_DIR), reproduzível e verificável contra a tabela
+EVENTOS_DIR = os.environ.get('EVENTOS_DIR')
+EVENTOS_SEGMENTO = int(os.environ.get('EVENTOS_SEGMENTO', 1000000))   # registos por segmento
+EVENTOS_FSYNC = os.environ.get('EVENTOS_FSYNC') == '1'
+_registo = None
+_registo_lock = threading.Lock()
+
+def obter_registo():
+    """Registo de eventos deste processo (None se desativado)"""
+    global _registo
+    if not EVENTOS_DIR:
+        return None
+    if _registo is None:
+        with _registo_lock:
+            if _registo is None:
+                from registo_eventos import RegistoEventos
+                _registo = RegistoEventos(EVENTOS_DIR, EVENTOS_SEGMENTO, EVENTOS_FSYNC)
+    return _registo
+
+def _instante_utc(created_at, avaliacao_date, avaliacao_time):
+    """Segundos UTC de um voto já gravado (created_at em UTC; sem ele, a hora local)"""
+    if created_at:
+        if isinstance(created_at, str):
+            created_at = datetime.fromisoformat(created_at)
+        return int(created_at.replace(tzinfo=timezone.utc).timestamp())
+    local = datetime.fromisoformat(f'{str(avaliacao_date)[:10]} {str(avaliacao_time)[:5]}')
+    return int(local.replace(tzinfo=SITE_TZ).timestamp())
+
+def importar_registo(tamanho_lote=50000):
+    """Acrescentar ao registo os votos da tabela com id acima do último registado"""
+    from analitica import dia_ordinal, minuto_do_dia
+    
+    registo = obter_registo()
+    conn = get_db()
+    cursor = conn.cursor()
+    if DB_TYPE == 'sqlite':
         cursor.execute('''
-            SELECT MAX(sequential_number) as max_seq 
-            FROM avaliacoes 
-            WHERE avaliacao_date = %s
-        ''', (today,))
-        result = cursor.fetchone()
-        max_seq = result[0] if result[0] else 0
+            SELECT id, tipo, avaliacao_date, avaliacao_time, sequential_number, created_at
+            FROM avaliacoes
+            WHERE id > ?
+            ORDER BY id
+        ''', (registo.ultimo_id(),))
+    else:
+        cursor.execute('''
+            SELECT id, tipo, avaliacao_date, avaliacao_time, sequential_number, created_at
+            FROM avaliacoes
+            WHERE id > %s
+            ORDER BY id
+        ''', (registo.ultimo_id(),))
     
+    importados = 0
+    while True:
+        rows = cursor.fetchmany(tamanho_lote)
+        if not rows:
+            break
+        registo.acrescentar_muitos(
+            (row[0], _instante_utc(row[5], row[2], row[3]), dia_ordinal(row[2]),
+             row[4], minuto_do_dia(row[3]), row[1])
+            for row in rows)
+        importados += len(rows)
+    conn.close()
+    return importados
+
+def verificar_registo():
+    """Comparar votos e último número sequencial por dia e tipo entre o registo e a tabela"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT avaliacao_date, tipo, COUNT(*), MAX(sequential_number)
+        FROM avaliacoes
+        GROUP BY avaliacao_date, tipo
+    ''')
+    tabela = {(date.fromisoformat(str(row[0])[:10]).toordinal(), row[1]): [row[2], row[3]]
+              for row in cursor.fetchall()}
     conn.close()
-    return max_seq + 1
+    
+    registo = obter_registo().totais_diarios()
+    diferencas = []
+    for chave in sorted(set(tabela) | set(registo)):
+        if tabela.get(chave) != registo.get(chave):
+            diferencas.append({
+                'dia': date.fromordinal(chave[0]).isoformat(),
+                'tipo': chave[1],
+                'tabela': tabela.get(chave, [0, 0]),
+                'registo': registo.get(chave, [0, 0])
+            })
+    return {
+        'ok': not diferencas,
+        'votos_tabela': sum(v[0] for v in tabela.values()),
+        'votos_registo': sum(v[0] for v in registo.values()),
+        'diferencas': diferencas
+    }
+
+# Limitação de pedidos e supressão de cliques duplicados (antes de abrir a BD)
+RATE_LIMIT_RATE = float(os.environ.get('RATE_LIMIT_RATE', 2))        # votos/segundo por quiosque
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 20))     # rajada máxima
+DEDUP_WINDOW = float(os.environ.get('DEDUP_WINDOW', 1.0))            # segundos
+RATE_LIMIT_MAX_CLIENTES = int(os.environ.get('RATE_LIMIT_MAX_CLIENTES', 10000))
+# Limite por IP, comum a todos os ?k= desse IP (vários quiosques atrás do mesmo NAT partilham-no)
+RATE_LIMIT_IP_RATE = float(os.environ.get('RATE_LIMIT_IP_RATE', RATE_LIMIT_RATE))
+RATE_LIMIT_IP_BURST = float(os.environ.get('RATE_LIMIT_IP_BURST', RATE_LIMIT_BURST))
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memoria')
+
+class LimitadorMemoria:
+    """Token bucket por IP e por quiosque e dedup por quiosque, em memória (LRU com tamanho limitado)"""
+    
+    def __init__(self, rate, burst, janela, max_clientes, rate_ip=None, burst_ip=None):
+        self.rate = rate
+        self.burst = burst
+        self.rate_ip = rate if rate_ip is None else rate_ip
+        self.burst_ip = burst if burst_ip is None else burst_ip
+        self.janela = janela
+        self.max_clientes = max_clientes
+        # IP ou quiosque -> [tokens, último pedido, último tipo, último voto aceite]
+        self._clientes = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _balde(self, chave, agora, rate, burst):
+        """Estado de um balde, com os tokens repostos até agora (chamar com o lock)"""
+        estado = self._clientes.get(chave)
+        if estado is None:
+            estado = self._clientes[chave] = [burst, agora, None, 0.0]
+            if len(self._clientes) > self.max_clientes:
+                self._clientes.popitem(last=False)
+        else:
+            estado[0] = min(burst, estado[0] + (agora - estado[1]) * rate)
+            estado[1] = agora
+            self._clientes.move_to_end(chave)
+        return estado
+    
+    def verificar(self, ip, quiosque, tipo):
+        """Devolver (None, 0) se aceite, ou (motivo, segundos até poder repetir)"""
+        agora = time.monotonic()
+        with self._lock:
+            q = self._balde(quiosque, agora, self.rate, self.burst)
+            if tipo == q[2] and agora - q[3] < self.janela:
+                return 'duplicado', self.janela - (agora - q[3])
+            
+            # Trocar de ?k= dá um balde novo ao quiosque, mas não ao IP
+            i = self._balde(ip, agora, self.rate_ip, self.burst_ip)
+            if q[0] < 1:
+                return 'limite', (1 - q[0]) / self.rate
+            if i[0] < 1:
+                return 'limite', (1 - i[0]) / self.rate_ip
+            
+            q[0] -= 1
+            i[0] -= 1
+            q[2], q[3] = tipo, agora
+        return None, 0
+
+class LimitadorPartilhado:
+    """Limitador partilhado entre workers/instâncias (janela fixa por IP e por quiosque + dedup no estado partilhado)"""
+    
+    def __init__(self, estado, rate, burst, janela, rate_ip=None, burst_ip=None):
+        self.estado = estado
+        self.burst = burst
+        self.burst_ip = burst if burst_ip is None else burst_ip
+        self.janela = janela
+        self.periodo = max(1, int(burst / rate))
+        self.periodo_ip = max(1, int(self.burst_ip / (rate if rate_ip is None else rate_ip)))
+    
+    def _contar(self, chave, periodo, agora):
+        """Pedidos na janela fixa atual de uma chave"""
+        chave = f'{chave}:{int(agora // periodo)}'
+        usados = self.estado.incr(chave)
+        if usados == 1:
+            self.estado.expire(chave, periodo * 2)
+        return usados
+    
+    def verificar(self, ip, quiosque, tipo):
+        """Devolver (None, 0) se aceite, ou (motivo, segundos até poder repetir)"""
+        try:
+            if self.janela > 0:
+                novo = self.estado.set(f'dedup:{quiosque}:{tipo}', 1, nx=True, px=int(self.janela * 1000))
+                if not novo:
+                    return 'duplicado', self.janela
+            
+            agora = time.time()
+            usados_ip = self._contar(f'rl:ip:{ip}', self.periodo_ip, agora)
+            usados = self._contar(f'rl:{quiosque}', self.periodo, agora)
+        except Exception as e:
+            # Se o estado partilhado falhar, não perder votos
+            print(f"Erro no limitador partilhado: {e}")
+            return None, 0
+        
+        if usados_ip > self.burst_ip:
+            return 'limite', self.periodo_ip - (agora % self.periodo_ip)
+        if usados > self.burst:
+            return 'limite', self.periodo - (agora % self.periodo)
+        return None, 0
+
+# 'redis' mantido como sinónimo de 'partilhado' (configurações antigas)
+if RATE_LIMIT_BACKEND in ('partilhado', 'redis'):
+    limitador = LimitadorPartilhado(estado, RATE_LIMIT_RATE, RATE_LIMIT_BURST, DEDUP_WINDOW,
+                                    RATE_LIMIT_IP_RATE, RATE_LIMIT_IP_BURST)
+else:
+    limitador = LimitadorMemoria(RATE_LIMIT_RATE, RATE_LIMIT_BURST, DEDUP_WINDOW, RATE_LIMIT_MAX_CLIENTES,
+                                 RATE_LIMIT_IP_RATE, RATE_LIMIT_IP_BURST)
+
+def _cliente_id():
+    """Identificar o cliente: (IP, quiosque = IP + identificador opcional ?k=)"""
+    ip = request.remote_addr
+    return ip, f"{ip}|{request.args.get('k', '')[:64]}"
+
+def _rejeitar_voto(tipo):
+    """Aplicar limitador; devolver resposta de rejeição ou None"""
+    motivo, espera = limitador.verificar(*_cliente_id(), tipo)
+    if motivo is None:
+        return None
+    
+    if motivo == 'duplicado':
+        response = jsonify({'error': 'Avaliação duplicada'})
+        response.status_code = 409
+    else:
+        response = jsonify({'error': 'Demasiados pedidos'})
+        response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, int(espera + 0.999)))
+    return response
+
+# Pipeline de assets: minificar, pré-comprimir (gzip/brotli) e guardar em memória
+_assets = {}
+_assets_lock = threading.Lock()
+_COMENTARIO_CSS = re.compile(r'/\*.*?\*/', re.S)
+
+def _minificar(texto, mimetype):
+    """Minificação conservadora: indentação, linhas vazias e comentários"""
+    if mimetype == 'text/css':
+        texto = _COMENTARIO_CSS.sub('', texto)
+    linhas = []
+    for linha in texto.splitlines():
+        linha = linha.strip()
+        if not linha:
+            continue
+        if mimetype.endswith('javascript') and linha.startswith('//'):
+            continue
+        linhas.append(linha)
+    return '\n'.join(linhas)
+
+def _criar_asset(texto, mimetype):
+    """Minificar e pré-comprimir um asset de texto"""
+    dados = _minificar(texto, mimetype).encode('utf-8')
+    variantes = {'identity': dados}
+    if len(dados) > 256:
+        variantes['gzip'] = gzip.compress(dados, 9, mtime=0)
+        if brotli is not None:
+            variantes['br'] = brotli.compress(dados)
+    return {
+        'mimetype': mimetype,
+        'etag': hashlib.sha1(dados).hexdigest()[:16],
+        'variantes': variantes
+    }
+
+def _asset_estatico(filename):
+    """Obter (e criar na primeira vez) o asset de um ficheiro em static/"""
+    chave = 'static:' + filename
+    asset = _assets.get(chave)
+    if asset is None:
+        path = safe_join(app.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        with open(path, 'rb') as f:
+            conteudo = f.read()
+        if mimetype.startswith('text/') or mimetype.endswith('javascript'):
+            asset = _criar_asset(conteudo.decode('utf-8'), mimetype)
+        else:
+            asset = {
+                'mimetype': mimetype,
+                'etag': hashlib.sha1(conteudo).hexdigest()[:16],
+                'variantes': {'identity': conteudo}
+            }
+        with _assets_lock:
+            _assets[chave] = asset
+    return asset
+
+def _asset_template(nome):
+    """Obter o HTML renderizado (minificado e comprimido) de um template"""
+    chave = 'template:' + nome
+    asset = _assets.get(chave)
+    if asset is None:
+        asset = _criar_asset(render_template(nome), 'text/html')
+        with _assets_lock:
+            _assets[chave] = asset
+    return asset
+
+def _resposta_asset(asset, cache_control):
+    """Servir a variante pré-comprimida aceite pelo cliente"""
+    codificacao = 'identity'
+    for cod in ('br', 'gzip'):
+        if cod in asset['variantes'] and request.accept_encodings[cod]:
+            codificacao = cod
+            break
+    
+    response = Response(asset['variantes'][codificacao], mimetype=asset['mimetype'])
+    if codificacao != 'identity':
+        response.headers['Content-Encoding'] = codificacao
+    if len(asset['variantes']) > 1:
+        response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(f"{asset['etag']}-{codificacao}")
+    return response.make_conditional(request)
+
+def render_cached(nome):
+    """Servir um template já renderizado a partir da memória"""
+    return _resposta_asset(_asset_template(nome), 'no-cache')
+
+def servir_estatico(filename):
+    """Servir ficheiros de static/ minificados, comprimidos e com impressão digital"""
+    asset = _asset_estatico(filename)
+    if request.args.get('v') == asset['etag']:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'no-cache'
+    return _resposta_asset(asset, cache_control)
+
+app.view_functions['static'] = servir_estatico
+
+@app.url_defaults
+def _impressao_digital_estatico(endpoint, values):
+    """Acrescentar ?v=<hash> aos URLs de static/ para cache de longa duração"""
+    if endpoint == 'static' and 'filename' in values:
+        values['v'] = _asset_estatico(values['filename'])['etag']
+
+def preparar_assets():
+    """Pré-processar todos os templates e ficheiros estáticos (arranque)"""
+    for root, _, files in os.walk(app.static_folder):
+        for name in files:
+            rel = os.path.relpath(os.path.join(root, name), app.static_folder)
+            _asset_estatico(rel.replace(os.sep, '/'))
+    with app.test_request_context('/'):
+        for nome in ('index.html', 'dashboard.html', 'login.html', 'admin.html'):
+            _asset_template(nome)
 
 @app.route('/')
 def index():
     """Página principal"""
-    return render_template('index.html')
+    return render_cached('index.html')
 
 @app.route('/dashboard')
 def dashboard():
     """Dashboard de estatísticas"""
-    return render_template('dashboard.html')
+    return render_cached('dashboard.html')
 
 @app.route('/api/avaliar', methods=['POST'])
 def registar_avaliacao():
@@ -111,72 +1064,90 @@ def registar_avaliacao():
         data = request.json
         tipo = data.get('tipo')
         
-        if not tipo or tipo not in [1, 2, 3]:
-            return jsonify({'error': 'Tipo de avaliação inválido'}), 400
-        
-        now = datetime.now()
-        avaliacao_date = now.date().isoformat()
-        avaliacao_time = now.strftime('%H:%M')
-        sequential_number = get_sequential_number(tipo)
-        
-        conn = get_db()
-        cursor = conn.cursor()
+        # Limitador antes da validação: usa o tipo em bruto e nunca abre conexões à BD
+        rejeicao = _rejeitar_voto(tipo)
+        if rejeicao is not None:
+            return rejeicao
         
-        if DB_TYPE == 'sqlite':
-            cursor.execute('''
-                INSERT INTO avaliacoes (tipo, avaliacao_date, avaliacao_time, sequential_number)
-                VALUES (?, ?, ?, ?)
-            ''', (tipo, avaliacao_date, avaliacao_time, sequential_number))
-        else:
-            cursor.execute('''
-                INSERT INTO avaliacoes (tipo, avaliacao_date, avaliacao_time, sequential_number)
-                VALUES (%s, %s, %s, %s)
-            ''', (tipo, avaliacao_date, avaliacao_time, sequential_number))
+        if not opcao_valida(tipo):
+            return jsonify({'error': 'Tipo de avaliação inválido'}), 400
         
-        conn.commit()
-        conn.close()
+        sequential_number, avaliacao_date, avaliacao_time, stats = _inserir_avaliacao(tipo)
         
         return jsonify({
             'success': True,
             'sequential_number': sequential_number,
             'date': avaliacao_date,
-            'time': avaliacao_time
+            'time': avaliacao_time,
+            'stats': stats
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/k', methods=['POST'])
+def registar_avaliacao_kiosk():
+    """Registo rápido do quiosque (form ou sendBeacon, resposta mínima)"""
+    # Aceita "tipo=1" (form/URLSearchParams) ou apenas "1" (text/plain)
+    valor = request.form.get('tipo') or request.get_data(as_text=True)
+    if valor.startswith('tipo='):
+        valor = valor[5:]
+    try:
+        tipo = int(valor)
+    except ValueError:
+        return Response(b'{"error":"tipo"}', status=400, mimetype='application/json')
+    
+    # Limitador antes da validação: a cache de opções expirada abriria uma conexão à BD
+    rejeicao = _rejeitar_voto(tipo)
+    if rejeicao is not None:
+        return rejeicao
+    
+    if not opcao_valida(tipo):
+        return Response(b'{"error":"tipo"}', status=400, mimetype='application/json')
+    
+    # Id gerado pelo quiosque: o reenvio por sendBeacon de um voto já gravado é ignorado
+    voto_id = request.form.get('v', '')[:64] or None
+    try:
+        resultado = _inserir_avaliacao(tipo, voto_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if resultado is None:
+        return Response(b'{"error":"duplicado"}', status=409, mimetype='application/json')
+    sequential_number, _, avaliacao_time, stats = resultado
+    
+    body = b'{"n":%d,"h":"%s","c":%s}' % (sequential_number, avaliacao_time.encode(), dumps_json(stats))
+    return Response(body, mimetype='application/json')
+
 @app.route('/api/avaliacoes', methods=['GET'])
 def get_avaliacoes():
-    """Obter avaliações de hoje"""
+    """Obter avaliações de hoje (só as novas se for indicado after_id)"""
     try:
-        today = date.today().isoformat()
+        today = dia_atual_iso()
+        after_id = request.args.get('after_id', 0, type=int)
         conn = get_db()
-        cursor = conn.cursor()
+        cursor = cursor_tuplos(conn)
         
         if DB_TYPE == 'sqlite':
             cursor.execute('''
-                SELECT tipo, sequential_number, avaliacao_date, avaliacao_time
+                SELECT id, tipo, sequential_number, avaliacao_date, avaliacao_time
                 FROM avaliacoes
-                WHERE avaliacao_date = ?
+                WHERE avaliacao_date = ? AND id > ?
                 ORDER BY id DESC
                 LIMIT 100
-            ''', (today,))
-            avaliacoes = cursor.fetchall()
-            result = [dict(row) for row in avaliacoes]
+            ''', (today, after_id))
         else:
             cursor.execute('''
-                SELECT tipo, sequential_number, avaliacao_date, avaliacao_time
+                SELECT id, tipo, sequential_number, avaliacao_date, avaliacao_time
                 FROM avaliacoes
-                WHERE avaliacao_date = %s
+                WHERE avaliacao_date = %s AND id > %s
                 ORDER BY id DESC
                 LIMIT 100
-            ''', (today,))
-            avaliacoes = cursor.fetchall()
-            result = [{'tipo': row[0], 'sequential_number': row[1], 'avaliacao_date': row[2], 'avaliacao_time': row[3]} for row in avaliacoes]
-        
+            ''', (today, after_id))
+        avaliacoes = cursor.fetchall()
         conn.close()
-        return jsonify({'avaliacoes': result})
+        
+        colunas = ['id', 'tipo', 'sequential_number', 'avaliacao_date', 'avaliacao_time']
+        return resposta_linhas('avaliacoes', avaliacoes, colunas, date=today)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -185,35 +1156,10 @@ def get_avaliacoes():
 def get_stats():
     """Obter estatísticas"""
     try:
-        today = date.today().isoformat()
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        if DB_TYPE == 'sqlite':
-            cursor.execute('''
-                SELECT tipo, MAX(sequential_number) as total
-                FROM avaliacoes
-                WHERE avaliacao_date = ?
-                GROUP BY tipo
-            ''', (today,))
-            stats = cursor.fetchall()
-            result = {1: 0, 2: 0, 3: 0}
-            for row in stats:
-                result[row['tipo']] = row['total']
-        else:
-            cursor.execute('''
-                SELECT tipo, MAX(sequential_number) as total
-                FROM avaliacoes
-                WHERE avaliacao_date = %s
-                GROUP BY tipo
-            ''', (today,))
-            stats = cursor.fetchall()
-            result = {1: 0, 2: 0, 3: 0}
-            for row in stats:
-                result[row[0]] = row[1]
-        
-        conn.close()
-        return jsonify(result)
+        today = dia_atual_iso()
+        response = Response(dumps_json(_contadores_do_dia(today)), mimetype='application/json')
+        response.headers['X-Dia'] = today
+        return response
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -261,11 +1207,11 @@ def export_data():
         writer.writerow(['Tipo', 'Avaliacao', 'Data', 'Hora', 'Numero'])
         
         # Dados
-        tipos_nome = {1: 'Muito Satisfeito', 2: 'Satisfeito', 3: 'Insatisfeito'}
+        tipos_nome = opcoes()['nomes']
         for row in data:
             writer.writerow([
                 row['tipo'],
-                tipos_nome[row['tipo']],
+                tipos_nome.get(row['tipo'], ''),
                 row['avaliacao_date'],
                 row['avaliacao_time'],
                 row['sequential_number']
@@ -283,79 +1229,627 @@ def export_data():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def login_required(f):
-    """Decorator para verificar se o utilizador está autenticado"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user' not in session:
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return decorated_function
+# Utilizadores e sessões de administração guardados na BD
+SESSAO_DURACAO = int(os.environ.get('SESSAO_DURACAO', 8 * 3600))         # segundos
+SESSAO_CACHE_TTL = int(os.environ.get('SESSAO_CACHE_TTL', 30))           # revalidar na BD a cada N s
+SESSAO_CACHE_MAX = int(os.environ.get('SESSAO_CACHE_MAX', 1000))
+_hash_falso = []  # hash usado quando o utilizador não existe (mesmo custo de verificação)
+# Limite de verificações scrypt em simultâneo por processo (cada uma usa ~32 MiB e CPU);
+# o pedido continua à espera do resultado, só não há mais de N hashes a correr ao mesmo tempo
+HASH_CONCORRENCIA = int(os.environ.get('HASH_CONCORRENCIA', 2))
+_executor_hash = ThreadPoolExecutor(max_workers=HASH_CONCORRENCIA, thread_name_prefix='hash')
+# hash do token -> (utilizador, expira_em, validado_em)
+_sessoes_cache = OrderedDict()
+_sessoes_lock = threading.Lock()
 
-@app.route('/login', methods=['GET', 'POST'])
-def login():
+def _hash_token(token):
+    """A BD guarda só o hash do token da sessão"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def criar_utilizador(username, password):
+    """Criar ou atualizar utilizador com password salgada e com hash"""
+    password_hash = generate_password_hash(password)
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    if DB_TYPE == 'sqlite':
+        cursor.execute('''
+            INSERT INTO utilizadores (username, password_hash) VALUES (?, ?)
+            ON CONFLICT (username) DO UPDATE SET password_hash = excluded.password_hash
+        ''', (username, password_hash))
+    else:
+        cursor.execute('''
+            INSERT INTO utilizadores (username, password_hash) VALUES (%s, %s)
+            ON CONFLICT (username) DO UPDATE SET password_hash = EXCLUDED.password_hash
+        ''', (username, password_hash))
+    
+    conn.commit()
+    conn.close()
+
+def _criar_admin_inicial(cursor):
+    """Se não houver utilizadores, criar o administrador inicial (ADMIN_USER/ADMIN_PASSWORD)"""
+    cursor.execute('SELECT COUNT(*) FROM utilizadores')
+    if cursor.fetchone()[0] > 0:
+        return
+    username = os.environ.get('ADMIN_USER', 'pedro')
+    password_hash = generate_password_hash(os.environ.get('ADMIN_PASSWORD', '1234'))
+    # Vários workers podem arrancar ao mesmo tempo
+    if DB_TYPE == 'sqlite':
+        cursor.execute('''
+            INSERT INTO utilizadores (username, password_hash) VALUES (?, ?)
+            ON CONFLICT (username) DO NOTHING
+        ''', (username, password_hash))
+    else:
+        cursor.execute('''
+            INSERT INTO utilizadores (username, password_hash) VALUES (%s, %s)
+            ON CONFLICT (username) DO NOTHING
+        ''', (username, password_hash))
+
+def verificar_credenciais(username, password):
+    """Verificar password (bloqueia até ao resultado; no máximo HASH_CONCORRENCIA hashes em simultâneo)"""
+    conn = get_db()
+    cursor = conn.cursor()
+    if DB_TYPE == 'sqlite':
+        cursor.execute('SELECT password_hash FROM utilizadores WHERE username = ?', (username,))
+    else:
+        cursor.execute('SELECT password_hash FROM utilizadores WHERE username = %s', (username,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if row is None and not _hash_falso:
+        _hash_falso.append(generate_password_hash(secrets.token_hex(8)))
+    password_hash = row[0] if row else _hash_falso[0]
+    valido = _executor_hash.submit(check_password_hash, password_hash, password).result()
+    return valido and row is not None
+
+def criar_sessao(username):
+    """Criar sessão no servidor; devolve o token para o cookie"""
+    token = secrets.token_urlsafe(32)
+    agora = int(time.time())
+    expira_em = agora + SESSAO_DURACAO
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    if DB_TYPE == 'sqlite':
+        cursor.execute('DELETE FROM sessoes WHERE expira_em < ?', (agora,))
+        cursor.execute('''
+            INSERT INTO sessoes (token_hash, username, criada_em, expira_em)
+            VALUES (?, ?, ?, ?)
+        ''', (_hash_token(token), username, agora, expira_em))
+    else:
+        cursor.execute('DELETE FROM sessoes WHERE expira_em < %s', (agora,))
+        cursor.execute('''
+            INSERT INTO sessoes (token_hash, username, criada_em, expira_em)
+            VALUES (%s, %s, %s, %s)
+        ''', (_hash_token(token), username, agora, expira_em))
+    
+    conn.commit()
+    conn.close()
+    return token
+
+def validar_sessao(token):
+    """Devolver o utilizador da sessão, ou None (cache LRU; BD só a cada SESSAO_CACHE_TTL s)"""
+    if not token:
+        return None
+    chave = _hash_token(token)
+    agora = time.time()
+    
+    with _sessoes_lock:
+        entrada = _sessoes_cache.get(chave)
+        if entrada is not None:
+            username, expira_em, validado_em = entrada
+            if agora < expira_em and agora - validado_em < SESSAO_CACHE_TTL:
+                _sessoes_cache.move_to_end(chave)
+                return username
+            del _sessoes_cache[chave]
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    if DB_TYPE == 'sqlite':
+        cursor.execute('''
+            SELECT username, expira_em FROM sessoes
+            WHERE token_hash = ? AND revogada = 0 AND expira_em > ?
+        ''', (chave, int(agora)))
+    else:
+        cursor.execute('''
+            SELECT username, expira_em FROM sessoes
+            WHERE token_hash = %s AND revogada = 0 AND expira_em > %s
+        ''', (chave, int(agora)))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if row is None:
+        return None
+    
+    with _sessoes_lock:
+        _sessoes_cache[chave] = (row[0], row[1], agora)
+        if len(_sessoes_cache) > SESSAO_CACHE_MAX:
+            _sessoes_cache.popitem(last=False)
+    return row[0]
+
+def revogar_sessoes(token=None, username=None):
+    """Revogar uma sessão (token) ou todas as sessões de um utilizador"""
+    conn = get_db()
+    cursor = conn.cursor()
+    ph = '?' if DB_TYPE == 'sqlite' else '%s'
+    if token is not None:
+        cursor.execute(f'UPDATE sessoes SET revogada = 1 WHERE token_hash = {ph}', (_hash_token(token),))
+    else:
+        cursor.execute(f'UPDATE sessoes SET revogada = 1 WHERE username = {ph}', (username,))
+    revogadas = cursor.rowcount
+    conn.commit()
+    conn.close()
+    
+    mensagem = f'sessao:{_hash_token(token)}' if token is not None else f'utilizador:{username}'
+    _esquecer_sessoes(CANAL_INVALIDAR, mensagem)
+    # Os outros workers esquecem já a sessão em vez de esperarem SESSAO_CACHE_TTL
+    try:
+        estado.publish(CANAL_INVALIDAR, mensagem)
+    except Exception as e:
+        print(f"Erro ao publicar invalidação no estado partilhado: {e}")
+    return revogadas
+
+def _esquecer_sessoes(canal, mensagem):
+    """Retirar da cache local as sessões indicadas ('sessao:<hash>' ou 'utilizador:<nome>')"""
+    tipo, _, valor = mensagem.partition(':')
+    with _sessoes_lock:
+        if tipo == 'sessao':
+            _sessoes_cache.pop(valor, None)
+        elif tipo == 'utilizador':
+            for chave in [k for k, v in _sessoes_cache.items() if v[0] == valor]:
+                del _sessoes_cache[chave]
+
+def login_required(f):
+    """Decorator para verificar se o utilizador está autenticado"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        utilizador = validar_sessao(session.get('sid'))
+        if utilizador is None:
+            return redirect(url_for('login'))
+        g.utilizador = utilizador
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
     """Página de login"""
     if request.method == 'POST':
         data = request.json
         username = data.get('username')
         password = data.get('password')
         
-        # Credenciais hardcoded
-        if username == 'pedro' and password == '1234':
-            session['user'] = username
+        if username and password and verificar_credenciais(username, password):
+            session.clear()
+            session['sid'] = criar_sessao(username)
             return jsonify({'success': True})
         else:
             return jsonify({'success': False, 'error': 'Credenciais inválidas'}), 401
     
-    return render_template('login.html')
+    return render_cached('login.html')
 
 @app.route('/admin')
 @login_required
 def admin():
     """Página de administração"""
-    return render_template('admin.html')
+    return render_cached('admin.html')
 
 @app.route('/logout')
 def logout():
     """Fazer logout"""
+    token = session.get('sid')
+    if token:
+        revogar_sessoes(token=token)
     session.clear()
     return redirect(url_for('login'))
 
-@app.route('/api/admin/stats-temporal', methods=['GET'])
+@app.route('/api/admin/sessoes/revogar', methods=['POST'])
 @login_required
-def get_stats_temporal():
-    """Obter estatísticas temporais (últimos 30 dias)"""
+def revogar_sessoes_utilizador():
+    """Revogar todas as sessões de um utilizador (por omissão, o próprio)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        username = data.get('username') or g.utilizador
+        return jsonify({'success': True, 'revogadas': revogar_sessoes(username=username)})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.context_processor
+def _contexto_opcoes():
+    lista = opcoes()['lista']
+    # opcoes_todas inclui as desativadas: o histórico pode ter votos nelas
+    return {'opcoes_inquerito': [opcao for opcao in lista if opcao['ativo']], 'opcoes_todas': lista}
+
+@app.route('/api/admin/opcoes', methods=['GET'])
+@login_required
+def get_opcoes():
+    """Listar as opções do inquérito (ativas e inativas)"""
     try:
+        return resposta_json(opcoes()['lista'])
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/opcoes', methods=['POST'])
+@login_required
+def guardar_opcao():
+    """Criar ou alterar uma opção do inquérito (os campos omitidos mantêm o valor atual)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        tipo = data.get('id')
+        # O tipo ocupa um byte no armazém colunar e no registo de eventos
+        if not isinstance(tipo, int) or isinstance(tipo, bool) or not 1 <= tipo <= 255:
+            return jsonify({'error': 'id deve ser um inteiro entre 1 e 255'}), 400
+        
+        atual = next((o for o in opcoes()['lista'] if o['id'] == tipo), {})
+        nome = data.get('nome', atual.get('nome'))
+        if not nome or not isinstance(nome, str):
+            return jsonify({'error': 'Nome obrigatório'}), 400
+        ordem = data.get('ordem', atual.get('ordem', tipo))
+        if not isinstance(ordem, int) or isinstance(ordem, bool):
+            return jsonify({'error': 'ordem deve ser um inteiro'}), 400
+        opcao = (tipo, nome.strip(), str(data.get('emoji', atual.get('emoji', ''))),
+                 str(data.get('classe', atual.get('classe', ''))), ordem,
+                 1 if data.get('ativo', atual.get('ativo', True)) else 0,
+                 1 if data.get('positiva', atual.get('positiva', False)) else 0)
+        
         conn = get_db()
         cursor = conn.cursor()
+        ph = '?' if DB_TYPE == 'sqlite' else '%s'
+        cursor.execute(f'''
+            INSERT INTO survey_options (id, nome, emoji, classe, ordem, ativo, positiva)
+            VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})
+            ON CONFLICT (id) DO UPDATE SET
+                nome = excluded.nome, emoji = excluded.emoji, classe = excluded.classe,
+                ordem = excluded.ordem, ativo = excluded.ativo, positiva = excluded.positiva
+        ''', opcao)
+        conn.commit()
+        conn.close()
         
-        today = date.today()
-        start_date = (today - timedelta(days=29)).isoformat()
-        end_date = today.isoformat()
-        
-        if DB_TYPE == 'sqlite':
-            cursor.execute('''
-                SELECT avaliacao_date, tipo, MAX(sequential_number) as total
-                FROM avaliacoes
-                WHERE avaliacao_date BETWEEN ? AND ?
-                GROUP BY avaliacao_date, tipo
-                ORDER BY avaliacao_date DESC
-            ''', (start_date, end_date))
-            rows = cursor.fetchall()
-            result = [dict(row) for row in rows]
-        else:
-            cursor.execute('''
-                SELECT avaliacao_date, tipo, MAX(sequential_number) as total
-                FROM avaliacoes
-                WHERE avaliacao_date BETWEEN %s AND %s
-                GROUP BY avaliacao_date, tipo
-                ORDER BY avaliacao_date DESC
-            ''', (start_date, end_date))
-            rows = cursor.fetchall()
-            result = [{'avaliacao_date': row[0], 'tipo': row[1], 'total': row[2]} for row in rows]
+        invalidar_opcoes()
+        try:
+            estado.publish(CANAL_INVALIDAR, 'opcoes:')
+        except Exception as e:
+            print(f"Erro ao publicar invalidação no estado partilhado: {e}")
+        return resposta_json({'success': True, 'opcoes': opcoes()['lista']})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.cli.command('criar-utilizador')
+@click.argument('username')
+@click.password_option()
+def criar_utilizador_comando(username, password):
+    """Criar ou alterar a password de um utilizador de administração"""
+    init_db()
+    criar_utilizador(username, password)
+    click.echo(f'Utilizador {username} guardado.')
+
+def calcular_stats_temporal():
+    """Calcular estatísticas temporais (últimos 30 dias)"""
+    today = dia_atual()
+    start_date = (today - timedelta(days=29)).isoformat()
+    end_date = today.isoformat()
+    
+    store = obter_analitica()
+    if store is not None:
+        rows = store.max_seq_por_dia_tipo(today.toordinal() - 29, today.toordinal())
+        result = [{'avaliacao_date': date.fromordinal(dia).isoformat(), 'tipo': tipo, 'total': total}
+                  for dia, tipo, total in sorted(rows, key=lambda r: (-r[0], r[1]))]
+        return result
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    if DB_TYPE == 'sqlite':
+        cursor.execute('''
+            SELECT avaliacao_date, tipo, MAX(sequential_number) as total
+            FROM avaliacoes
+            WHERE avaliacao_date BETWEEN ? AND ?
+            GROUP BY avaliacao_date, tipo
+            ORDER BY avaliacao_date DESC
+        ''', (start_date, end_date))
+        rows = cursor.fetchall()
+        result = [dict(row) for row in rows]
+    else:
+        cursor.execute('''
+            SELECT avaliacao_date, tipo, MAX(sequential_number) as total
+            FROM avaliacoes
+            WHERE avaliacao_date BETWEEN %s AND %s
+            GROUP BY avaliacao_date, tipo
+            ORDER BY avaliacao_date DESC
+        ''', (start_date, end_date))
+        rows = cursor.fetchall()
+        result = [{'avaliacao_date': row[0], 'tipo': row[1], 'total': row[2]} for row in rows]
+    
+    conn.close()
+    return result
+
+def calcular_resumo_geral():
+    """Calcular resumo geral de estatísticas"""
+    store = obter_analitica()
+    if store is not None:
+        result_stats = contagens_vazias()
+        result_stats.update(store.max_seq_por_tipo())
+        today = dia_atual().toordinal()
+        today_result = contagens_vazias()
+        today_result.update(store.max_seq_por_tipo(today, today))
+        return {
+            'total_geral': store.contar(),
+            'stats_geral': result_stats,
+            'stats_hoje': today_result
+        }
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    if DB_TYPE == 'sqlite':
+        # Total de avaliações
+        cursor.execute('SELECT COUNT(*) as total FROM avaliacoes')
+        total = cursor.fetchone()['total']
+    
+        # Total por tipo (último valor de sequential_number para cada tipo)
+        cursor.execute('''
+            SELECT tipo, MAX(sequential_number) as total
+            FROM avaliacoes
+            GROUP BY tipo
+        ''')
+        stats = cursor.fetchall()
+        result_stats = contagens_vazias()
+        for row in stats:
+            result_stats[row['tipo']] = row['total']
+    
+        # Dados de hoje
+        today = dia_atual_iso()
+        cursor.execute('''
+            SELECT tipo, MAX(sequential_number) as total
+            FROM avaliacoes
+            WHERE avaliacao_date = ?
+            GROUP BY tipo
+        ''', (today,))
+        today_stats = cursor.fetchall()
+        today_result = contagens_vazias()
+        for row in today_stats:
+            today_result[row['tipo']] = row['total']
+    else:
+        cursor.execute('SELECT COUNT(*) as total FROM avaliacoes')
+        total = cursor.fetchone()[0]
+    
+        cursor.execute('''
+            SELECT tipo, MAX(sequential_number) as total
+            FROM avaliacoes
+            GROUP BY tipo
+        ''')
+        stats = cursor.fetchall()
+        result_stats = contagens_vazias()
+        for row in stats:
+            result_stats[row[0]] = row[1]
+    
+        today = dia_atual_iso()
+        cursor.execute('''
+            SELECT tipo, MAX(sequential_number) as total
+            FROM avaliacoes
+            WHERE avaliacao_date = %s
+            GROUP BY tipo
+        ''', (today,))
+        today_stats = cursor.fetchall()
+        today_result = contagens_vazias()
+        for row in today_stats:
+            today_result[row[0]] = row[1]
+    
+    conn.close()
+    
+    return {
+        'total_geral': total,
+        'stats_geral': result_stats,
+        'stats_hoje': today_result
+    }
+
+# Relatórios do painel admin pré-calculados em segundo plano (JSON guardado na BD)
+RELATORIOS_AGENDADOR = os.environ.get('RELATORIOS_AGENDADOR', '1') == '1'
+RELATORIOS_INTERVALO = int(os.environ.get('RELATORIOS_INTERVALO', 300))   # regenerar pelo menos a cada N s
+RELATORIOS_VERIFICAR = int(os.environ.get('RELATORIOS_VERIFICAR', 5))     # procurar votos novos a cada N s
+_LOCK_AGENDADOR_PG = 4207001  # chave do pg_advisory_lock partilhado entre workers
+_relatorios_evento = threading.Event()
+_agendador = {'thread': None}
+_agendador_lock = threading.Lock()
+
+RELATORIOS = {
+    'stats-temporal': calcular_stats_temporal,
+    'resumo-geral': calcular_resumo_geral
+}
+
+def guardar_relatorio(nome, dados):
+    """Guardar relatório serializado com a hora de geração (UTC)"""
+    blob = dumps_json(dados).decode('utf-8')
+    gerado_em = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    if DB_TYPE == 'sqlite':
+        cursor.execute('''
+            INSERT OR REPLACE INTO relatorios (nome, dados, gerado_em)
+            VALUES (?, ?, ?)
+        ''', (nome, blob, gerado_em))
+    else:
+        cursor.execute('''
+            INSERT INTO relatorios (nome, dados, gerado_em)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (nome) DO UPDATE SET dados = EXCLUDED.dados, gerado_em = EXCLUDED.gerado_em
+        ''', (nome, blob, gerado_em))
+    
+    conn.commit()
+    conn.close()
+    return gerado_em
+
+def ler_relatorio(nome):
+    """Obter (dados JSON, gerado_em) de um relatório guardado, ou None"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    if DB_TYPE == 'sqlite':
+        cursor.execute('SELECT dados, gerado_em FROM relatorios WHERE nome = ?', (nome,))
+    else:
+        cursor.execute('SELECT dados, gerado_em FROM relatorios WHERE nome = %s', (nome,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if row is None:
+        return None
+    return row[0], str(row[1])
+
+def gerar_relatorios():
+    """Recalcular e guardar todos os relatórios"""
+    return {nome: guardar_relatorio(nome, calcular()) for nome, calcular in RELATORIOS.items()}
+
+def _servir_relatorio(nome):
+    """Servir o relatório pré-calculado; calcular na hora se não existir ou estiver velho"""
+    if RELATORIOS_AGENDADOR:
+        guardado = ler_relatorio(nome)
+        if guardado is not None:
+            dados, gerado_em = guardado
+            idade = datetime.now(timezone.utc) - datetime.fromisoformat(gerado_em).replace(tzinfo=timezone.utc)
+            if idade.total_seconds() < RELATORIOS_INTERVALO * 2:
+                response = Response(dados, mimetype='application/json')
+                response.headers['X-Gerado-Em'] = gerado_em
+                return response
+    return resposta_json(RELATORIOS[nome]())
+
+def _ultimo_id():
+    """Maior id em avaliacoes (deteção barata de votos novos)"""
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('SELECT MAX(id) FROM avaliacoes')
+    row = cursor.fetchone()
+    conn.close()
+    return row[0] or 0
+
+def _obter_lideranca():
+    """Tentar ser o único agendador entre workers; devolve o recurso a manter aberto ou None"""
+    if DB_TYPE == 'sqlite':
+        try:
+            import fcntl
+        except ImportError:
+            # Windows: servidor de desenvolvimento com um só processo
+            return True
+        f = open(DATABASE + '.agendador.lock', 'w')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return None
+        return f
+    else:
+        # Conexão própria, fora do pool: fica aberta enquanto este worker for o agendador
+        import psycopg2
         
+        conn = psycopg2.connect(DATABASE_URL)
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', (_LOCK_AGENDADOR_PG,))
+        if cursor.fetchone()[0]:
+            return conn
         conn.close()
-        return jsonify(result)
+        return None
+
+def _lideranca_ativa(lideranca):
+    """A conexão que segura o advisory lock continua viva? (o PostgreSQL pode ter reiniciado)"""
+    if DB_TYPE == 'sqlite':
+        return True
+    try:
+        cursor = lideranca.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+        return True
+    except Exception:
+        lideranca.close()
+        return False
+
+def _ciclo_agendador():
+    """Ciclo do agendador: regenerar quando há votos novos ou o intervalo expira"""
+    lideranca = None
+    visto = None
+    ultima_geracao = 0.0
+    while True:
+        try:
+            if lideranca is None:
+                lideranca = _obter_lideranca()
+                if lideranca is None:
+                    # Outro worker é o agendador; tentar de novo mais tarde
+                    time.sleep(RELATORIOS_INTERVALO)
+                    continue
+            
+            _relatorios_evento.wait(RELATORIOS_VERIFICAR)
+            _relatorios_evento.clear()
+            if not _lideranca_ativa(lideranca):
+                lideranca = None
+                continue
+            
+            ultimo = _ultimo_id()
+            if ultimo != visto or time.time() - ultima_geracao >= RELATORIOS_INTERVALO:
+                gerar_relatorios()
+                visto = ultimo
+                ultima_geracao = time.time()
+                # Agrupar rajadas de votos numa só regeneração
+                time.sleep(RELATORIOS_VERIFICAR)
+            else:
+                # Sem votos novos desde a última verificação: momento calmo
+                _manutencao_agendada()
+        except Exception as e:
+            print(f"Erro no agendador de relatórios: {e}")
+            time.sleep(RELATORIOS_VERIFICAR)
+
+def iniciar_agendador():
+    """Arrancar o agendador de relatórios neste processo (uma vez)"""
+    if not RELATORIOS_AGENDADOR or _agendador['thread'] is not None:
+        return
+    with _agendador_lock:
+        if _agendador['thread'] is None:
+            # Votos gravados por qualquer worker acordam o agendador
+            estado.subscribe(CANAL_VOTOS, lambda canal, mensagem: _relatorios_evento.set())
+            thread = threading.Thread(target=_ciclo_agendador, name='agendador-relatorios', daemon=True)
+            _agendador['thread'] = thread
+            thread.start()
+
+_subscricoes = {'ativas': False}
+
+def _receber_invalidacao(canal, mensagem):
+    """Aplicar neste processo uma invalidação publicada por outro worker"""
+    if mensagem.startswith('opcoes:'):
+        invalidar_opcoes()
+    else:
+        _esquecer_sessoes(canal, mensagem)
+
+def subscrever_estado():
+    """Subscrever as invalidações publicadas pelos outros workers (uma vez por processo)"""
+    with _agendador_lock:
+        if not _subscricoes['ativas']:
+            _subscricoes['ativas'] = True
+            estado.subscribe(CANAL_INVALIDAR, _receber_invalidacao)
+
+@app.before_request
+def _arrancar_segundo_plano():
+    if not _subscricoes['ativas']:
+        subscrever_estado()
+    if _agendador['thread'] is None:
+        iniciar_agendador()
+
+@app.route('/api/admin/stats-temporal', methods=['GET'])
+@login_required
+def get_stats_temporal():
+    """Obter estatísticas temporais (últimos 30 dias)"""
+    try:
+        return _servir_relatorio('stats-temporal')
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/relatorios/atualizar', methods=['POST'])
+@login_required
+def atualizar_relatorios():
+    """Regenerar já os relatórios do painel"""
+    try:
+        return resposta_json({'success': True, 'gerado_em': gerar_relatorios()})
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -372,7 +1866,7 @@ def get_historico():
         offset = (page - 1) * per_page
         
         conn = get_db()
-        cursor = conn.cursor()
+        cursor = cursor_tuplos(conn)
         
         # Obter dados
         if DB_TYPE == 'sqlite':
@@ -382,19 +1876,6 @@ def get_historico():
                 ORDER BY avaliacao_date DESC, avaliacao_time DESC
                 LIMIT ? OFFSET ?
             ''', (per_page, offset))
-            avaliacoes = cursor.fetchall()
-            data = []
-            for row in avaliacoes:
-                data.append({
-                    'tipo': row['tipo'],
-                    'avaliacao_date': row['avaliacao_date'],
-                    'avaliacao_time': row['avaliacao_time'],
-                    'sequential_number': row['sequential_number']
-                })
-            
-            cursor.execute('SELECT COUNT(*) as cnt FROM avaliacoes')
-            total_row = cursor.fetchone()
-            total = total_row['cnt'] if total_row else 0
         else:
             cursor.execute('''
                 SELECT tipo, avaliacao_date, avaliacao_time, sequential_number
@@ -402,30 +1883,18 @@ def get_historico():
                 ORDER BY avaliacao_date DESC, avaliacao_time DESC
                 LIMIT %s OFFSET %s
             ''', (per_page, offset))
-            avaliacoes = cursor.fetchall()
-            data = []
-            for row in avaliacoes:
-                data.append({
-                    'tipo': row[0],
-                    'avaliacao_date': str(row[1]),
-                    'avaliacao_time': str(row[2]),
-                    'sequential_number': row[3]
-                })
-            
-            cursor.execute('SELECT COUNT(*) FROM avaliacoes')
-            total_row = cursor.fetchone()
-            total = total_row[0] if total_row else 0
+        avaliacoes = cursor.fetchall()
+        
+        cursor.execute('SELECT COUNT(*) FROM avaliacoes')
+        total_row = cursor.fetchone()
+        total = total_row[0] if total_row else 0
         
         conn.close()
         
         pages = max(1, (total + per_page - 1) // per_page)
         
-        return jsonify({
-            'historico': data,
-            'total': total,
-            'page': page,
-            'pages': pages
-        })
+        colunas = ['tipo', 'avaliacao_date', 'avaliacao_time', 'sequential_number']
+        return resposta_linhas('historico', avaliacoes, colunas, total=total, page=page, pages=pages)
     
     except Exception as e:
         import traceback
@@ -437,75 +1906,505 @@ def get_historico():
 def get_resumo_geral():
     """Obter resumo geral de estatísticas"""
     try:
+        return _servir_relatorio('resumo-geral')
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/distribuicao-horaria', methods=['GET'])
+@login_required
+def get_distribuicao_horaria():
+    """Obter votos por hora do dia e por tipo (últimos N dias)"""
+    try:
+        dias = max(1, request.args.get('dias', 30, type=int))
+        today = dia_atual()
+        start_date = (today - timedelta(days=dias - 1)).isoformat()
+        end_date = today.isoformat()
+        
+        store = obter_analitica()
+        if store is not None:
+            inicio, fim = today.toordinal() - (dias - 1), today.toordinal()
+            return jsonify({
+                'total': store.contar(inicio, fim),
+                'por_hora': store.histograma_horario(inicio, fim),
+                'por_tipo': store.distribuicao(inicio, fim)
+            })
+        
         conn = get_db()
         cursor = conn.cursor()
+        por_hora = [0] * 24
+        por_tipo = {}
         
         if DB_TYPE == 'sqlite':
-            # Total de avaliações
-            cursor.execute('SELECT COUNT(*) as total FROM avaliacoes')
-            total = cursor.fetchone()['total']
-            
-            # Total por tipo (último valor de sequential_number para cada tipo)
-            cursor.execute('''
-                SELECT tipo, MAX(sequential_number) as total
-                FROM avaliacoes
-                GROUP BY tipo
-            ''')
-            stats = cursor.fetchall()
-            result_stats = {1: 0, 2: 0, 3: 0}
-            for row in stats:
-                result_stats[row['tipo']] = row['total']
-            
-            # Dados de hoje
-            today = date.today().isoformat()
             cursor.execute('''
-                SELECT tipo, MAX(sequential_number) as total
+                SELECT CAST(substr(avaliacao_time, 1, 2) AS INTEGER) as hora, tipo, COUNT(*) as total
                 FROM avaliacoes
-                WHERE avaliacao_date = ?
-                GROUP BY tipo
-            ''', (today,))
-            today_stats = cursor.fetchall()
-            today_result = {1: 0, 2: 0, 3: 0}
-            for row in today_stats:
-                today_result[row['tipo']] = row['total']
+                WHERE avaliacao_date BETWEEN ? AND ?
+                GROUP BY hora, tipo
+            ''', (start_date, end_date))
         else:
-            cursor.execute('SELECT COUNT(*) as total FROM avaliacoes')
-            total = cursor.fetchone()[0]
-            
             cursor.execute('''
-                SELECT tipo, MAX(sequential_number) as total
+                SELECT EXTRACT(HOUR FROM avaliacao_time)::int as hora, tipo, COUNT(*) as total
                 FROM avaliacoes
-                GROUP BY tipo
-            ''')
-            stats = cursor.fetchall()
-            result_stats = {1: 0, 2: 0, 3: 0}
-            for row in stats:
-                result_stats[row[0]] = row[1]
-            
-            today = date.today().isoformat()
-            cursor.execute('''
-                SELECT tipo, MAX(sequential_number) as total
-                FROM avaliacoes
-                WHERE avaliacao_date = %s
-                GROUP BY tipo
-            ''', (today,))
-            today_stats = cursor.fetchall()
-            today_result = {1: 0, 2: 0, 3: 0}
-            for row in today_stats:
-                today_result[row[0]] = row[1]
+                WHERE avaliacao_date BETWEEN %s AND %s
+                GROUP BY hora, tipo
+            ''', (start_date, end_date))
+        for hora, tipo, total in cursor.fetchall():
+            por_hora[hora] += total
+            por_tipo[tipo] = por_tipo.get(tipo, 0) + total
         
         conn.close()
-        
         return jsonify({
-            'total_geral': total,
-            'stats_geral': result_stats,
-            'stats_hoje': today_result
+            'total': sum(por_hora),
+            'por_hora': por_hora,
+            'por_tipo': por_tipo
         })
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/admin/eventos/verificar', methods=['GET'])
+@login_required
+def get_verificacao_eventos():
+    """Comparar o registo de eventos com a tabela avaliacoes"""
+    try:
+        if obter_registo() is None:
+            return jsonify({'error': 'Registo de eventos desativado (EVENTOS_DIR)'}), 404
+        return resposta_json(verificar_registo())
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.cli.command('eventos-importar')
+def importar_registo_comando():
+    """Copiar para o registo de eventos os votos que ainda lá não estão"""
+    if obter_registo() is None:
+        raise click.ClickException('Defina EVENTOS_DIR para ativar o registo de eventos.')
+    click.echo(f'{importar_registo()} votos importados para {EVENTOS_DIR}.')
+
+@app.cli.command('eventos-verificar')
+def verificar_registo_comando():
+    """Verificar o registo de eventos contra a tabela avaliacoes"""
+    if obter_registo() is None:
+        raise click.ClickException('Defina EVENTOS_DIR para ativar o registo de eventos.')
+    resultado = verificar_registo()
+    click.echo(f"Tabela: {resultado['votos_tabela']} votos; registo: {resultado['votos_registo']} votos.")
+    for d in resultado['diferencas']:
+        click.echo(f"{d['dia']} tipo {d['tipo']}: tabela {d['tabela']}, registo {d['registo']}")
+    if not resultado['ok']:
+        raise SystemExit(1)
+    click.echo('Registo coerente com a tabela.')
+
+# Manutenção da BD: limpeza, integridade, estatísticas, compactação e backups online
+MANUTENCAO_HORA = int(os.environ.get('MANUTENCAO_HORA', 4))           # hora local; -1 desativa a agendada
+MANUTENCAO_PAGINAS = int(os.environ.get('MANUTENCAO_PAGINAS', 1000))  # páginas SQLite por passo
+BACKUP_DIR = os.environ.get('BACKUP_DIR')                             # backups da manutenção agendada
+BACKUP_MANTER = int(os.environ.get('BACKUP_MANTER', 7))
+MANUTENCAO_OPERACOES = ('sessoes', 'integridade', 'analisar', 'compactar', 'reindexar', 'vacuum')
+# Por omissão e na manutenção agendada: só operações que deixam os votos passar.
+# 'reindexar' e 'vacuum' (SQLite) bloqueiam as escritas e correm só quando pedidas.
+MANUTENCAO_PADRAO = ('sessoes', 'integridade', 'analisar', 'compactar')
+# Tabelas copiadas no backup PostgreSQL (sessões e relatórios são recriados)
+BACKUP_TABELAS = [
+    ('survey_options', ['id', 'nome', 'emoji', 'classe', 'ordem', 'ativo', 'positiva']),
+    ('utilizadores', ['id', 'username', 'password_hash', 'created_at']),
+    ('avaliacoes', ['id', 'tipo', 'avaliacao_date', 'avaliacao_time', 'sequential_number', 'created_at', 'voto_id'])
+]
+_manutencao = {'dia': None}
+
+def _conexao_manutencao():
+    """Conexão própria em autocommit (VACUUM não corre dentro de transações)"""
+    if DB_TYPE == 'sqlite':
+        # Os inserts do quiosque (get_db) esperam até SQLITE_TIMEOUT s pelos passos que
+        # precisam de lock; com WAL só o VACUUM completo e o REINDEX os bloqueiam
+        return sqlite3.connect(DATABASE, isolation_level=None, timeout=SQLITE_TIMEOUT)
+    import psycopg2
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    return conn
+
+def _executar_operacao(cursor, operacao):
+    """Executar uma operação de manutenção; devolve o resultado para o relatório"""
+    if operacao == 'sessoes':
+        ph = '?' if DB_TYPE == 'sqlite' else '%s'
+        # Revogadas ou expiradas há mais de um dia
+        cursor.execute(f'DELETE FROM sessoes WHERE revogada = 1 OR expira_em < {ph}', (int(time.time()) - 86400,))
+        return {'apagadas': cursor.rowcount}
+    
+    if DB_TYPE == 'sqlite':
+        if operacao == 'integridade':
+            cursor.execute('PRAGMA integrity_check')
+            problemas = [row[0] for row in cursor.fetchall()]
+            return {'ok': problemas == ['ok'], 'problemas': [] if problemas == ['ok'] else problemas[:20]}
+        if operacao == 'analisar':
+            cursor.execute('ANALYZE')
+            cursor.execute('PRAGMA optimize')
+            return {}
+        if operacao == 'reindexar':
+            cursor.execute('REINDEX')
+            return {}
+        if operacao == 'compactar':
+            cursor.execute('PRAGMA freelist_count')
+            livres = cursor.fetchone()[0]
+            cursor.execute('PRAGMA auto_vacuum')
+            if cursor.fetchone()[0] != 2:
+                return {'modo': None, 'paginas_livres': livres,
+                        'nota': 'sem auto_vacuum incremental: correr uma vez a operação vacuum'}
+            # Libertar páginas aos poucos, deixando os inserts passar entre passos
+            while livres > 0:
+                # execute() só avança o PRAGMA um passo (uma página); executescript corre-o até ao fim
+                cursor.executescript(f'PRAGMA incremental_vacuum({MANUTENCAO_PAGINAS});')
+                cursor.execute('PRAGMA freelist_count')
+                livres = cursor.fetchone()[0]
+                time.sleep(0.01)
+            return {'modo': 'incremental'}
+        if operacao == 'vacuum':
+            # VACUUM completo (bloqueia as escritas até acabar); passa a BD para auto_vacuum
+            # incremental, para que a compactação diária seja feita por passos
+            cursor.execute('PRAGMA freelist_count')
+            livres = cursor.fetchone()[0]
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            cursor.execute('VACUUM')
+            return {'modo': 'completo', 'paginas_livres': livres}
+    else:
+        if operacao == 'integridade':
+            return {'ok': None, 'nota': 'sem verificação de integridade no PostgreSQL (usar amcheck)'}
+        if operacao == 'analisar':
+            cursor.execute('ANALYZE')
+            return {}
+        if operacao == 'reindexar':
+            # CONCURRENTLY (PostgreSQL 12+) não bloqueia os inserts
+            for tabela, _ in BACKUP_TABELAS:
+                cursor.execute(f'REINDEX TABLE CONCURRENTLY {tabela}')
+            return {}
+        if operacao == 'compactar':
+            # VACUUM simples (não FULL) recupera espaço sem bloquear escritas
+            cursor.execute('VACUUM (ANALYZE)')
+            return {}
+        if operacao == 'vacuum':
+            return {'nota': 'sem VACUUM FULL no PostgreSQL (bloquearia os inserts); compactar já faz VACUUM'}
+    raise ValueError(f'Operação desconhecida: {operacao}')
+
+def executar_manutencao(operacoes=None):
+    """Correr as operações pedidas (MANUTENCAO_PADRAO por omissão) e guardar o resultado"""
+    operacoes = list(operacoes or MANUTENCAO_PADRAO)
+    for operacao in operacoes:
+        if operacao not in MANUTENCAO_OPERACOES:
+            raise ValueError(f'Operação desconhecida: {operacao}')
+    
+    conn = _conexao_manutencao()
+    cursor = conn.cursor()
+    resultados = []
+    try:
+        for operacao in operacoes:
+            t0 = time.perf_counter()
+            try:
+                resultado = _executar_operacao(cursor, operacao)
+            except Exception as e:
+                resultado = {'error': str(e)}
+            resultado.update(operacao=operacao, ms=round((time.perf_counter() - t0) * 1000, 1))
+            resultados.append(resultado)
+    finally:
+        conn.close()
+    
+    relatorio = {'dia': dia_atual_iso(), 'operacoes': resultados}
+    guardar_relatorio('manutencao', relatorio)
+    return relatorio
+
+def tamanhos():
+    """Espaço ocupado por tabela e índice"""
+    conn = _conexao_manutencao()
+    cursor = conn.cursor()
+    objetos = []
+    try:
+        if DB_TYPE == 'sqlite':
+            cursor.execute('''
+                SELECT name, type, tbl_name FROM sqlite_master
+                WHERE type IN ('table', 'index') AND name NOT LIKE 'sqlite_%'
+                ORDER BY tbl_name, type DESC, name
+            ''')
+            esquema = cursor.fetchall()
+            try:
+                # dbstat dá o espaço exato de cada objeto (se o SQLite o incluir)
+                cursor.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name')
+                bytes_por_nome = dict(cursor.fetchall())
+            except sqlite3.OperationalError:
+                bytes_por_nome = {}
+            for nome, tipo, tabela in esquema:
+                linhas = None
+                if tipo == 'table':
+                    cursor.execute(f'SELECT COUNT(*) FROM "{nome}"')
+                    linhas = cursor.fetchone()[0]
+                objetos.append({'nome': nome, 'tipo': 'tabela' if tipo == 'table' else 'indice',
+                                'tabela': tabela, 'bytes': bytes_por_nome.get(nome), 'linhas': linhas})
+            cursor.execute('PRAGMA page_size')
+            pagina = cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_count')
+            total = cursor.fetchone()[0] * pagina
+            cursor.execute('PRAGMA freelist_count')
+            livres = cursor.fetchone()[0] * pagina
+        else:
+            cursor.execute('''
+                SELECT c.relname, c.relkind, COALESCE(t.relname, c.relname),
+                       pg_relation_size(c.oid), c.reltuples::bigint
+                FROM pg_class c
+                LEFT JOIN pg_index i ON i.indexrelid = c.oid
+                LEFT JOIN pg_class t ON t.oid = i.indrelid
+                WHERE c.relnamespace = 'public'::regnamespace AND c.relkind IN ('r', 'i')
+                ORDER BY 3, c.relkind DESC, c.relname
+            ''')
+            for nome, tipo, tabela, tamanho, linhas in cursor.fetchall():
+                objetos.append({'nome': nome, 'tipo': 'tabela' if tipo == 'r' else 'indice', 'tabela': tabela,
+                                'bytes': tamanho, 'linhas': linhas if tipo == 'r' else None})
+            cursor.execute('SELECT pg_database_size(current_database())')
+            total = cursor.fetchone()[0]
+            livres = None
+    finally:
+        conn.close()
+    return {'bd': DB_TYPE, 'total_bytes': total, 'livres_bytes': livres, 'objetos': objetos}
+
+class _Escritor:
+    """Objeto ficheiro mínimo para copy_expert"""
+    
+    def __init__(self, escrever):
+        self.write = escrever
+
+def _backup_postgres(escrever):
+    """Dump em SQL simples com o formato de dados do pg_dump (COPY ... FROM stdin), restaurável com psql"""
+    import psycopg2
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        # Snapshot coerente entre tabelas sem bloquear os inserts (MVCC)
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        cursor = conn.cursor()
+        escrever(f"-- Backup satisfacao {datetime.now(timezone.utc).isoformat()}\n"
+                 "-- Restaurar numa BD com o esquema criado pela aplicação (init_db)\n"
+                 "SET client_encoding = 'UTF8';\n\n".encode())
+        for tabela, colunas in BACKUP_TABELAS:
+            lista = ', '.join(colunas)
+            escrever(f'COPY public.{tabela} ({lista}) FROM stdin;\n'.encode())
+            cursor.copy_expert(f'COPY {tabela} ({lista}) TO STDOUT', _Escritor(escrever))
+            escrever(b'\\.\n\n')
+        for tabela in ('utilizadores', 'avaliacoes'):
+            escrever(f"SELECT setval(pg_get_serial_sequence('{tabela}', 'id'), "
+                     f"COALESCE((SELECT MAX(id) FROM {tabela}), 1));\n".encode())
+    finally:
+        conn.close()
+
+def _backup_sqlite(destino):
+    """Cópia online com a API de backup, por passos: os inserts do quiosque continuam entre passos"""
+    origem = sqlite3.connect(DATABASE, timeout=SQLITE_TIMEOUT)
+    copia = sqlite3.connect(destino)
+    try:
+        origem.backup(copia, pages=MANUTENCAO_PAGINAS, sleep=0.005)
+    finally:
+        copia.close()
+        origem.close()
+
+def nome_backup():
+    extensao = 'db' if DB_TYPE == 'sqlite' else 'sql'
+    return f"satisfacao-{datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')}.{extensao}"
+
+def backup_para_ficheiro(destino):
+    """Gravar um backup completo em destino"""
+    if DB_TYPE == 'sqlite':
+        _backup_sqlite(destino)
+    else:
+        with open(destino, 'wb') as f:
+            _backup_postgres(f.write)
+    return destino
+
+def produzir_backup(escrever):
+    """Escrever um backup completo com escrever(bytes) (para transmitir por HTTP)"""
+    if DB_TYPE == 'sqlite':
+        fd, temporario = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        try:
+            _backup_sqlite(temporario)
+            with open(temporario, 'rb') as f:
+                for bloco in iter(lambda: f.read(256 * 1024), b''):
+                    escrever(bloco)
+        finally:
+            os.remove(temporario)
+    else:
+        _backup_postgres(escrever)
+
+def _transmitir(produtor):
+    """Correr produtor(escrever) numa thread e devolver os blocos à medida que chegam"""
+    fila = queue.Queue(maxsize=64)
+    cancelado = threading.Event()
+    
+    def escrever(bloco):
+        # Contrapressão: espera pelo cliente; desiste se a resposta foi abandonada
+        while not cancelado.is_set():
+            try:
+                fila.put(bytes(bloco), timeout=1)
+                return
+            except queue.Full:
+                pass
+        raise ConnectionAbortedError('Transferência cancelada')
+    
+    def correr():
+        try:
+            produtor(escrever)
+            fila.put(None)
+        except Exception as e:
+            if not cancelado.is_set():
+                fila.put(e)
+    
+    threading.Thread(target=correr, name='backup', daemon=True).start()
+    try:
+        while True:
+            bloco = fila.get()
+            if bloco is None:
+                return
+            if isinstance(bloco, Exception):
+                raise bloco
+            yield bloco
+    finally:
+        cancelado.set()
+
+def _rodar_backups():
+    """Backup para BACKUP_DIR, mantendo só os BACKUP_MANTER mais recentes"""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    destino = backup_para_ficheiro(os.path.join(BACKUP_DIR, nome_backup()))
+    antigos = sorted(f for f in os.listdir(BACKUP_DIR) if f.startswith('satisfacao-'))
+    for nome in antigos[:-BACKUP_MANTER]:
+        os.remove(os.path.join(BACKUP_DIR, nome))
+    return destino
+
+def _manutencao_agendada():
+    """No agendador, em momento calmo: manutenção (MANUTENCAO_PADRAO) uma vez por dia à MANUTENCAO_HORA"""
+    if MANUTENCAO_HORA < 0 or agora_local().hour != MANUTENCAO_HORA:
+        return
+    hoje = dia_atual_iso()
+    if _manutencao['dia'] is None:
+        # Depois de reiniciar: ver se outro processo já a fez hoje
+        guardado = ler_relatorio('manutencao')
+        _manutencao['dia'] = json.loads(guardado[0]).get('dia') if guardado else ''
+    if _manutencao['dia'] == hoje:
+        return
+    
+    _manutencao['dia'] = hoje
+    relatorio = executar_manutencao()
+    if BACKUP_DIR:
+        try:
+            relatorio['backup'] = _rodar_backups()
+        except Exception as e:
+            relatorio['backup'] = {'error': str(e)}
+        guardar_relatorio('manutencao', relatorio)
+    print(f"Manutenção agendada concluída: {relatorio}")
+
+@app.route('/api/admin/manutencao', methods=['GET'])
+@login_required
+def get_manutencao():
+    """Tamanhos de tabelas e índices e resultado da última manutenção"""
+    try:
+        guardado = ler_relatorio('manutencao')
+        return resposta_json({
+            'tamanhos': tamanhos(),
+            'ultima': json.loads(guardado[0]) if guardado else None,
+            'ultima_em': guardado[1] if guardado else None
+        })
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/manutencao', methods=['POST'])
+@login_required
+def executar_manutencao_admin():
+    """Correr já operações de manutenção ({"operacoes": [...]}, MANUTENCAO_PADRAO por omissão)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        operacoes = data.get('operacoes')
+        if operacoes is not None and (not isinstance(operacoes, list)
+                                      or any(op not in MANUTENCAO_OPERACOES for op in operacoes)):
+            return jsonify({'error': f'Operações válidas: {", ".join(MANUTENCAO_OPERACOES)}'}), 400
+        return resposta_json(executar_manutencao(operacoes))
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/backup', methods=['GET'])
+@login_required
+def descarregar_backup():
+    """Descarregar um backup online da BD (transmitido à medida que é lido)"""
+    mimetype = 'application/vnd.sqlite3' if DB_TYPE == 'sqlite' else 'application/sql'
+    response = Response(_transmitir(produzir_backup), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={nome_backup()}'
+    return response
+
+@app.cli.command('manutencao')
+@click.option('--operacao', '-o', 'operacoes', multiple=True, type=click.Choice(MANUTENCAO_OPERACOES),
+              help='Operação a correr (repetível; por omissão ' + ', '.join(MANUTENCAO_PADRAO) + ')')
+def manutencao_comando(operacoes):
+    """Limpar sessões, verificar integridade, atualizar estatísticas e compactar (reindexar e vacuum só com -o)"""
+    init_db()
+    for resultado in executar_manutencao(operacoes)['operacoes']:
+        click.echo(f"{resultado.pop('operacao'):<12} {resultado.pop('ms'):>10} ms  {resultado or ''}")
+
+@app.cli.command('tamanhos')
+def tamanhos_comando():
+    """Mostrar o espaço ocupado por tabelas e índices"""
+    relatorio = tamanhos()
+    for objeto in relatorio['objetos']:
+        tamanho = '-' if objeto['bytes'] is None else f"{objeto['bytes'] / 1024:.0f} KiB"
+        linhas = '' if objeto['linhas'] is None else f"{objeto['linhas']} linhas"
+        click.echo(f"{objeto['tipo']:<7} {objeto['nome']:<32} {tamanho:>12}  {linhas}")
+    click.echo(f"Total: {relatorio['total_bytes'] / 2**20:.1f} MiB")
+    if relatorio['livres_bytes'] is not None:
+        click.echo(f"Livre (recuperável com compactar): {relatorio['livres_bytes'] / 2**20:.1f} MiB")
+
+@app.cli.command('backup')
+@click.argument('destino', required=False)
+def backup_comando(destino):
+    """Gravar um backup online da BD (por omissão no diretório atual)"""
+    destino = backup_para_ficheiro(destino or nome_backup())
+    click.echo(f'Backup gravado em {destino}.')
+
+# Sondas de saúde e aquecimento (o plano gratuito adormece e acorda a frio)
+ARRANQUE = {'import_ms': None, 'aquecimento_ms': None}
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: o processo responde (sem tocar na BD)"""
+    return resposta_json({'status': 'ok', 'arranque': ARRANQUE})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: a BD responde e o esquema existe"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM avaliacoes LIMIT 1')
+        cursor.fetchall()
+        cursor.execute('SELECT 1 FROM relatorios LIMIT 1')
+        cursor.fetchall()
+        conn.close()
+    except Exception as e:
+        return resposta_json({'status': 'indisponivel', 'error': str(e)}, status=503)
+    return resposta_json({'status': 'ready'})
+
+def aquecer():
+    """Pré-abrir conexões, pré-compilar templates e preparar caches antes do primeiro pedido"""
+    t0 = time.perf_counter()
+    if DB_TYPE == 'postgres':
+        # Emprestar e devolver DB_POOL_MIN conexões para ficarem abertas no pool
+        conns = [get_db() for _ in range(DB_POOL_MIN)]
+        for conn in conns:
+            conn.close()
+    preparar_assets()
+    _contadores_do_dia(dia_atual_iso())
+    obter_analitica()
+    subscrever_estado()
+    iniciar_agendador()
+    ARRANQUE['aquecimento_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+    print(f"Arranque: import {ARRANQUE['import_ms']} ms, aquecimento {ARRANQUE['aquecimento_ms']} ms")
+
+ARRANQUE['import_ms'] = round((time.perf_counter() - _ARRANQUE_T0) * 1000, 1)
+
 if __name__ == '__main__':
     init_db()
+    aquecer()
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=True, host='0.0.0.0', port=port, use_reloader=False)
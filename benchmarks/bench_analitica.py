@@ -0,0 +1,124 @@
+"""Benchmark das análises do painel admin: SQL (SQLite) vs armazém colunar.
+
+Gera N votos sintéticos (por omissão 10 milhões), e mede para cada caminho:
+carregamento, resumo geral (total + MAX por tipo + hoje), estatísticas dos
+últimos 30 dias, histograma horário e memória ocupada.
+
+Uso: python benchmarks/bench_analitica.py [votos]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analitica  # noqa: E402
+from analitica import VotosColunares  # noqa: E402
+
+VOTOS_POR_DIA = 400
+
+
+def gerar_db(path, n):
+    """Criar base de dados com n votos distribuídos por dias consecutivos"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE avaliacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo INTEGER NOT NULL,
+            avaliacao_date DATE NOT NULL,
+            avaliacao_time TIME NOT NULL,
+            sequential_number INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX idx_avaliacoes_date_id ON avaliacoes (avaliacao_date, id)')
+    rnd = random.Random(42)
+    inicio = date.today() - timedelta(days=n // VOTOS_POR_DIA)
+
+    def linhas():
+        for i in range(n):
+            dia = (inicio + timedelta(days=i // VOTOS_POR_DIA)).isoformat()
+            yield (rnd.randint(1, 3), dia, f'{rnd.randint(8, 19):02d}:{rnd.randint(0, 59):02d}',
+                   i % VOTOS_POR_DIA + 1)
+
+    conn.executemany('''
+        INSERT INTO avaliacoes (tipo, avaliacao_date, avaliacao_time, sequential_number)
+        VALUES (?, ?, ?, ?)
+    ''', linhas())
+    conn.commit()
+    conn.close()
+
+
+def cronometrar(nome, funcao, repeticoes=3):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        funcao()
+        melhor = min(melhor, time.perf_counter() - t0)
+    print(f'  {nome:<22} {melhor * 1000:10.2f} ms')
+
+
+def caminho_sql(conn):
+    hoje = date.today().isoformat()
+    inicio = (date.today() - timedelta(days=29)).isoformat()
+    print('SQL (SQLite):')
+    cronometrar('resumo geral', lambda: (
+        conn.execute('SELECT COUNT(*) FROM avaliacoes').fetchone(),
+        conn.execute('SELECT tipo, MAX(sequential_number) FROM avaliacoes GROUP BY tipo').fetchall(),
+        conn.execute('SELECT tipo, MAX(sequential_number) FROM avaliacoes '
+                     'WHERE avaliacao_date = ? GROUP BY tipo', (hoje,)).fetchall()))
+    cronometrar('temporal 30 dias', lambda: conn.execute(
+        'SELECT avaliacao_date, tipo, MAX(sequential_number) FROM avaliacoes '
+        'WHERE avaliacao_date BETWEEN ? AND ? GROUP BY avaliacao_date, tipo', (inicio, hoje)).fetchall())
+    cronometrar('histograma horário', lambda: conn.execute(
+        'SELECT CAST(substr(avaliacao_time, 1, 2) AS INTEGER) h, COUNT(*) FROM avaliacoes GROUP BY h').fetchall())
+    cronometrar('distribuição por tipo', lambda: conn.execute(
+        'SELECT tipo, COUNT(*) FROM avaliacoes GROUP BY tipo').fetchall())
+
+
+def caminho_colunar(store):
+    hoje = date.today().toordinal()
+    print(f"Colunar ({'NumPy' if analitica.np is not None else 'Python puro'}):")
+    cronometrar('resumo geral', lambda: (
+        store.contar(), store.max_seq_por_tipo(), store.max_seq_por_tipo(hoje, hoje)))
+    cronometrar('temporal 30 dias', lambda: store.max_seq_por_dia_tipo(hoje - 29, hoje))
+    cronometrar('histograma horário', lambda: store.histograma_horario())
+    cronometrar('distribuição por tipo', lambda: store.distribuicao())
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.remove(path)
+    try:
+        t0 = time.perf_counter()
+        gerar_db(path, n)
+        print(f'{n} votos gerados em {time.perf_counter() - t0:.1f} s '
+              f'(ficheiro SQLite: {os.path.getsize(path) / 2**20:.1f} MiB)')
+
+        conn = sqlite3.connect(path)
+        caminho_sql(conn)
+
+        sql = 'SELECT id, tipo, avaliacao_date, avaliacao_time, sequential_number FROM avaliacoes ORDER BY id'
+        t0 = time.perf_counter()
+        store = VotosColunares()
+        store.carregar(conn.execute(sql))
+        carga = time.perf_counter() - t0
+
+        # Pico de memória durante o carregamento (segunda passagem, com tracemalloc)
+        tracemalloc.start()
+        VotosColunares().carregar(conn.execute(sql))
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'Carregamento colunar: {carga:.1f} s, colunas {store.memoria() / 2**20:.1f} MiB '
+              f'({store.memoria() / n:.0f} B/voto), pico {pico / 2**20:.1f} MiB')
+        caminho_colunar(store)
+        conn.close()
+    finally:
+        os.remove(path)
@@ -0,0 +1,72 @@
+"""Benchmark do registo de eventos: totais diários por SQL (SQLite) vs reprodução.
+
+Gera N votos sintéticos (por omissão 1 milhão) na tabela e no registo, e mede
+a reconstrução dos totais por dia e tipo (votos e MAX(sequential_number)) dos
+dois lados, para todos os dias e para os últimos 30.
+
+Uso: python benchmarks/bench_eventos.py [votos]
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import registo_eventos  # noqa: E402
+from analitica import dia_ordinal, minuto_do_dia  # noqa: E402
+from bench_analitica import cronometrar, gerar_db  # noqa: E402
+from registo_eventos import RegistoEventos  # noqa: E402
+
+
+def gerar_registo(conn, diretorio):
+    """Copiar a tabela para um registo de eventos (como o comando eventos-importar)"""
+    registo = RegistoEventos(diretorio)
+    cursor = conn.execute('SELECT id, tipo, avaliacao_date, avaliacao_time, sequential_number '
+                          'FROM avaliacoes ORDER BY id')
+    while True:
+        rows = cursor.fetchmany(50000)
+        if not rows:
+            break
+        registo.acrescentar_muitos((row[0], 0, dia_ordinal(row[2]), row[4], minuto_do_dia(row[3]), row[1])
+                                   for row in rows)
+    registo.fechar()
+    return registo
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.remove(path)
+    diretorio = tempfile.mkdtemp()
+    try:
+        gerar_db(path, n)
+        conn = sqlite3.connect(path)
+        t0 = time.perf_counter()
+        registo = gerar_registo(conn, diretorio)
+        tamanho = sum(os.path.getsize(os.path.join(diretorio, f)) for f in os.listdir(diretorio))
+        print(f'{n} votos; registo escrito em {time.perf_counter() - t0:.1f} s '
+              f'({tamanho / 2**20:.1f} MiB, {len(registo.segmentos())} segmentos)')
+
+        hoje = date.today()
+        inicio = (hoje - timedelta(days=29)).isoformat()
+        print('SQL (SQLite):')
+        cronometrar('totais diários', lambda: conn.execute(
+            'SELECT avaliacao_date, tipo, COUNT(*), MAX(sequential_number) FROM avaliacoes '
+            'GROUP BY avaliacao_date, tipo').fetchall())
+        cronometrar('totais 30 dias', lambda: conn.execute(
+            'SELECT avaliacao_date, tipo, COUNT(*), MAX(sequential_number) FROM avaliacoes '
+            'WHERE avaliacao_date BETWEEN ? AND ? GROUP BY avaliacao_date, tipo',
+            (inicio, hoje.isoformat())).fetchall())
+
+        print(f"Registo ({'NumPy' if registo_eventos.np is not None else 'Python puro'}):")
+        cronometrar('totais diários', lambda: registo.totais_diarios())
+        cronometrar('totais 30 dias', lambda: registo.totais_diarios(hoje.toordinal() - 29, hoje.toordinal()))
+        conn.close()
+    finally:
+        os.remove(path)
+        shutil.rmtree(diretorio)
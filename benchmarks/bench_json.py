@@ -0,0 +1,58 @@
+"""Microbenchmark da serialização JSON de linhas da BD.
+
+Compara, para N linhas (tuplos como os devolvidos pelo psycopg2, com date/time):
+jsonify sobre dicts (caminho antigo), dumps_json sobre dicts e dumps_json no
+formato compacto (listas + colunas), com json da biblioteca padrão e orjson.
+
+Uso: python benchmarks/bench_json.py [linhas]
+"""
+import os
+import sys
+import time
+from datetime import date, time as dt_time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RELATORIOS_AGENDADOR', '0')
+
+import app as satisfacao  # noqa: E402
+
+COLUNAS = ['tipo', 'avaliacao_date', 'avaliacao_time', 'sequential_number']
+
+
+def gerar_linhas(n):
+    inicio = date.today() - timedelta(days=n // 400)
+    return [(i % 3 + 1, inicio + timedelta(days=i // 400), dt_time(8 + i % 10, i % 60), i % 400 + 1)
+            for i in range(n)]
+
+
+def cronometrar(nome, funcao, repeticoes=5):
+    melhor = float('inf')
+    tamanho = 0
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        tamanho = len(funcao())
+        melhor = min(melhor, time.perf_counter() - t0)
+    print(f'  {nome:<34} {melhor * 1000:9.2f} ms  {tamanho / 1024:8.1f} KiB')
+
+
+def medir(linhas):
+    app = satisfacao.app
+    with app.test_request_context('/'):
+        cronometrar('jsonify(dicts) [antigo]', lambda: app.json.response(
+            {'historico': [{'tipo': r[0], 'avaliacao_date': str(r[1]), 'avaliacao_time': str(r[2]),
+                            'sequential_number': r[3]} for r in linhas]}).get_data())
+    cronometrar('dumps_json(dicts)', lambda: satisfacao.dumps_json(
+        {'historico': [dict(zip(COLUNAS, r)) for r in linhas]}))
+    cronometrar('dumps_json(compacto)', lambda: satisfacao.dumps_json(
+        {'colunas': COLUNAS, 'historico': linhas}))
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    linhas = gerar_linhas(n)
+    if satisfacao.orjson is not None:
+        print(f'{n} linhas, orjson:')
+        medir(linhas)
+    print(f'{n} linhas, json (biblioteca padrão):')
+    satisfacao.dumps_json = satisfacao._dumps_stdlib
+    medir(linhas)
@@ -0,0 +1,61 @@
+"""Benchmark do clique no quiosque: fluxo antigo vs endpoint rápido.
+
+Fluxo antigo: POST /api/avaliar (JSON) + GET /api/stats a cada clique.
+Fluxo novo:   POST /api/k (form compacto), contadores vêm na resposta.
+
+Uso: python benchmarks/bench_kiosk.py [cliques]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('RELATORIOS_AGENDADOR', '0')
+
+import app as satisfacao  # noqa: E402
+
+
+def preparar_db():
+    """Criar base de dados temporária"""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.remove(path)
+    satisfacao.DATABASE = path
+    # Contadores novos para cada base de dados
+    satisfacao.estado = satisfacao.criar_estado()
+    # O benchmark clica mais depressa do que um quiosque real
+    satisfacao.limitador = satisfacao.LimitadorMemoria(1e9, 1e9, 0, 10)
+    satisfacao.init_db()
+    return path
+
+
+def fluxo_antigo(client, cliques):
+    for i in range(cliques):
+        client.post('/api/avaliar', json={'tipo': i % 3 + 1})
+        client.get('/api/stats')
+
+
+def fluxo_rapido(client, cliques):
+    for i in range(cliques):
+        client.post('/api/k', data={'tipo': str(i % 3 + 1)})
+
+
+def medir(nome, fluxo, cliques):
+    path = preparar_db()
+    client = satisfacao.app.test_client()
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    fluxo(client, cliques)
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - wall0
+    os.remove(path)
+    print(f'{nome:<8} {cliques} cliques  CPU/clique {cpu / cliques * 1e6:8.1f} us  '
+          f'tempo/clique {wall / cliques * 1e6:8.1f} us')
+    return cpu
+
+
+if __name__ == '__main__':
+    cliques = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    antigo = medir('antigo', fluxo_antigo, cliques)
+    rapido = medir('rapido', fluxo_rapido, cliques)
+    print(f'Redução de CPU por clique: {(1 - rapido / antigo) * 100:.1f}%')
@@ -0,0 +1,475 @@
+"""Estado partilhado entre workers: contadores, máximos, chaves com validade e pub/sub.
+
+Dois backends com a mesma interface:
+
+- EstadoMemoria: dentro do processo (um só worker, desenvolvimento)
+- EstadoResp: cliente do protocolo Redis (RESP) por TCP (redis://) ou socket
+  Unix (unix://), para vários workers ou instâncias. Os máximos usam
+  ZADD ... GT, que requer Redis 6.2 ou posterior
+
+ServidorResp é um substituto local mínimo do Redis (subconjunto de comandos
+usado pela aplicação), útil para correr vários workers na mesma máquina sem
+instalar Redis. O gunicorn.conf.py pode arrancá-lo no processo master.
+"""
+import os
+import socket
+import socketserver
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def criar_estado(url=None):
+    """Criar o backend a partir de um URL (None/'' = memória do processo)"""
+    if not url or url == 'memoria://':
+        return EstadoMemoria()
+    return EstadoResp(url)
+
+
+class EstadoMemoria:
+    """Estado partilhado dentro do processo"""
+
+    def __init__(self):
+        self._dados = {}
+        self._expira = {}
+        self._subscritores = {}
+        self._lock = threading.Lock()
+        self._operacoes = 0
+
+    def _vivo(self, chave, agora):
+        """Remover a chave se expirou (chamar com o lock)"""
+        expira = self._expira.get(chave)
+        if expira is not None and agora >= expira:
+            del self._expira[chave]
+            self._dados.pop(chave, None)
+            return False
+        return chave in self._dados
+
+    def _limpar(self, agora):
+        """Apagar chaves expiradas de vez em quando (memória limitada)"""
+        self._operacoes += 1
+        if self._operacoes % 1000 == 0:
+            for chave in [k for k, t in self._expira.items() if agora >= t]:
+                del self._expira[chave]
+                self._dados.pop(chave, None)
+
+    def get(self, chave):
+        with self._lock:
+            if not self._vivo(chave, time.time()):
+                return None
+            return self._dados[chave]
+
+    def mget(self, *chaves):
+        agora = time.time()
+        with self._lock:
+            return [self._dados[c] if self._vivo(c, agora) else None for c in chaves]
+
+    def set(self, chave, valor, nx=False, px=None):
+        """Guardar valor; com nx=True só se a chave não existir. Devolve True se guardou"""
+        agora = time.time()
+        with self._lock:
+            self._limpar(agora)
+            if nx and self._vivo(chave, agora):
+                return False
+            self._dados[chave] = str(valor)
+            if px is not None:
+                self._expira[chave] = agora + px / 1000
+            else:
+                self._expira.pop(chave, None)
+            return True
+
+    def incr(self, chave, n=1):
+        with self._lock:
+            valor = int(self._dados[chave]) + n if self._vivo(chave, time.time()) else n
+            self._dados[chave] = str(valor)
+            return valor
+
+    def atualizar_maximos(self, chave, valores):
+        """Subir (nunca descer) o valor de cada membro {membro: valor}; devolve quantos membros são novos"""
+        agora = time.time()
+        with self._lock:
+            self._limpar(agora)
+            if not self._vivo(chave, agora):
+                self._dados[chave] = {}
+            atuais = self._dados[chave]
+            novos = 0
+            for membro, valor in valores.items():
+                membro, valor = str(membro), int(valor)
+                if membro not in atuais:
+                    novos += 1
+                    atuais[membro] = valor
+                elif valor > atuais[membro]:
+                    atuais[membro] = valor
+            return novos
+
+    def maximos(self, chave):
+        """{membro: valor} guardados com atualizar_maximos ({} se a chave não existir)"""
+        with self._lock:
+            if not self._vivo(chave, time.time()):
+                return {}
+            return dict(self._dados[chave])
+
+    def expire(self, chave, segundos):
+        with self._lock:
+            if not self._vivo(chave, time.time()):
+                return False
+            self._expira[chave] = time.time() + segundos
+            return True
+
+    def delete(self, *chaves):
+        with self._lock:
+            apagadas = 0
+            for chave in chaves:
+                self._expira.pop(chave, None)
+                if self._dados.pop(chave, None) is not None:
+                    apagadas += 1
+            return apagadas
+
+    def publish(self, canal, mensagem):
+        """Entregar mensagem aos subscritores do canal; devolve quantos a receberam"""
+        with self._lock:
+            callbacks = list(self._subscritores.get(canal, ()))
+        for callback in callbacks:
+            try:
+                callback(canal, str(mensagem))
+            except Exception as e:
+                print(f"Erro num subscritor de {canal}: {e}")
+        return len(callbacks)
+
+    def subscribe(self, canal, callback):
+        """Chamar callback(canal, mensagem) a cada publicação no canal"""
+        with self._lock:
+            self._subscritores.setdefault(canal, []).append(callback)
+
+    def unsubscribe(self, canal, callback):
+        with self._lock:
+            if callback in self._subscritores.get(canal, ()):
+                self._subscritores[canal].remove(callback)
+
+
+class ErroResp(Exception):
+    """Erro devolvido pelo servidor RESP"""
+
+
+def _codificar(*args):
+    """Codificar um comando como array RESP de bulk strings"""
+    partes = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        partes.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(partes)
+
+
+def _ler_resposta(f):
+    """Ler uma resposta RESP de um ficheiro de socket"""
+    linha = f.readline()
+    if not linha:
+        raise ConnectionError('Conexão fechada pelo servidor')
+    tipo, resto = linha[:1], linha[1:-2]
+    if tipo == b'+':
+        return resto.decode('utf-8')
+    if tipo == b'-':
+        raise ErroResp(resto.decode('utf-8'))
+    if tipo == b':':
+        return int(resto)
+    if tipo == b'$':
+        n = int(resto)
+        if n < 0:
+            return None
+        dados = f.read(n + 2)
+        return dados[:-2].decode('utf-8')
+    if tipo == b'*':
+        n = int(resto)
+        if n < 0:
+            return None
+        return [_ler_resposta(f) for _ in range(n)]
+    raise ConnectionError(f'Resposta RESP inválida: {linha!r}')
+
+
+class EstadoResp:
+    """Cliente RESP (Redis ou ServidorResp) com uma conexão por thread"""
+
+    def __init__(self, url, timeout=1.0):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._subscritores = {}
+        self._subs_lock = threading.Lock()
+        self._subs_thread = None
+
+    def _abrir(self, timeout):
+        """Abrir socket (TCP ou Unix), autenticar e escolher a BD"""
+        if self.url.scheme == 'unix':
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(timeout)
+            sock.connect(self.url.path)
+        else:
+            sock = socket.create_connection((self.url.hostname or 'localhost', self.url.port or 6379), timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(timeout)
+        f = sock.makefile('rb')
+        if self.url.password:
+            sock.sendall(_codificar('AUTH', self.url.password))
+            _ler_resposta(f)
+        db = self.url.path.strip('/') if self.url.scheme != 'unix' else ''
+        if db and db != '0':
+            sock.sendall(_codificar('SELECT', db))
+            _ler_resposta(f)
+        return sock, f
+
+    def _comando(self, *args):
+        """Enviar comando e ler resposta (uma nova tentativa se a conexão caiu)"""
+        for tentativa in (1, 2):
+            conexao = getattr(self._local, 'conexao', None)
+            try:
+                if conexao is None:
+                    conexao = self._local.conexao = self._abrir(self.timeout)
+                sock, f = conexao
+                sock.sendall(_codificar(*args))
+                return _ler_resposta(f)
+            except (OSError, ConnectionError):
+                self._local.conexao = None
+                if conexao is not None:
+                    conexao[0].close()
+                if tentativa == 2:
+                    raise
+
+    def get(self, chave):
+        return self._comando('GET', chave)
+
+    def mget(self, *chaves):
+        return self._comando('MGET', *chaves)
+
+    def set(self, chave, valor, nx=False, px=None):
+        args = ['SET', chave, valor]
+        if nx:
+            args.append('NX')
+        if px is not None:
+            args += ['PX', int(px)]
+        return self._comando(*args) == 'OK'
+
+    def incr(self, chave, n=1):
+        return self._comando('INCRBY', chave, n)
+
+    def atualizar_maximos(self, chave, valores):
+        args = ['ZADD', chave, 'GT']
+        for membro, valor in valores.items():
+            args += [int(valor), membro]
+        return self._comando(*args)
+
+    def maximos(self, chave):
+        resposta = self._comando('ZRANGE', chave, 0, -1, 'WITHSCORES')
+        return {resposta[i]: int(float(resposta[i + 1])) for i in range(0, len(resposta), 2)}
+
+    def expire(self, chave, segundos):
+        return self._comando('EXPIRE', chave, int(segundos)) == 1
+
+    def delete(self, *chaves):
+        return self._comando('DEL', *chaves)
+
+    def publish(self, canal, mensagem):
+        return self._comando('PUBLISH', canal, mensagem)
+
+    def subscribe(self, canal, callback):
+        """Chamar callback(canal, mensagem) a cada publicação (thread de escuta dedicada)"""
+        with self._subs_lock:
+            self._subscritores.setdefault(canal, []).append(callback)
+            if self._subs_thread is None:
+                self._subs_thread = threading.Thread(target=self._escutar, name='estado-subscritor', daemon=True)
+                self._subs_thread.start()
+            elif getattr(self, '_subs_sock', None) is not None:
+                try:
+                    self._subs_sock.sendall(_codificar('SUBSCRIBE', canal))
+                except OSError:
+                    pass
+
+    def unsubscribe(self, canal, callback):
+        with self._subs_lock:
+            if callback in self._subscritores.get(canal, ()):
+                self._subscritores[canal].remove(callback)
+
+    def _escutar(self):
+        """Ciclo da conexão de subscrição; volta a ligar se cair"""
+        while True:
+            try:
+                sock, f = self._abrir(None)
+                with self._subs_lock:
+                    canais = list(self._subscritores)
+                    self._subs_sock = sock
+                sock.sendall(_codificar('SUBSCRIBE', *canais))
+                while True:
+                    resposta = _ler_resposta(f)
+                    if isinstance(resposta, list) and resposta[0] == 'message':
+                        with self._subs_lock:
+                            callbacks = list(self._subscritores.get(resposta[1], ()))
+                        for callback in callbacks:
+                            try:
+                                callback(resposta[1], resposta[2])
+                            except Exception as e:
+                                print(f"Erro num subscritor de {resposta[1]}: {e}")
+            except (OSError, ConnectionError, ErroResp) as e:
+                print(f"Subscrição do estado partilhado perdida ({e}); a ligar de novo")
+                self._subs_sock = None
+                time.sleep(1)
+
+
+# SUBSCRIBE responde com uma confirmação por canal, já enviada pelo handler
+_SEM_RESPOSTA = object()
+
+
+class _HandlerResp(socketserver.StreamRequestHandler):
+    """Atender um cliente RESP do ServidorResp"""
+
+    def setup(self):
+        super().setup()
+        self._escrita = threading.Lock()
+        self._canais = []
+
+    def _responder(self, valor):
+        if valor is None:
+            dados = b'$-1\r\n'
+        elif isinstance(valor, bool):
+            dados = b':%d\r\n' % int(valor)
+        elif isinstance(valor, int):
+            dados = b':%d\r\n' % valor
+        elif isinstance(valor, ErroResp):
+            dados = b'-ERR %s\r\n' % str(valor).encode()
+        elif isinstance(valor, list):
+            dados = b'*%d\r\n' % len(valor) + b''.join(
+                b'$-1\r\n' if v is None else
+                (b':%d\r\n' % v if isinstance(v, int) else b'$%d\r\n%s\r\n' % (len(v.encode()), v.encode()))
+                for v in valor)
+        elif valor == 'OK' or valor == 'PONG':
+            dados = b'+%s\r\n' % valor.encode()
+        else:
+            valor = valor.encode('utf-8')
+            dados = b'$%d\r\n%s\r\n' % (len(valor), valor)
+        with self._escrita:
+            self.wfile.write(dados)
+            self.wfile.flush()
+
+    def _entregar(self, canal, mensagem):
+        """Callback de subscrição: enviar a mensagem a este cliente"""
+        try:
+            self._responder(['message', canal, mensagem])
+        except OSError:
+            pass
+
+    def handle(self):
+        estado = self.server.estado
+        try:
+            while True:
+                pedido = _ler_resposta(self.rfile)
+                if not isinstance(pedido, list) or not pedido:
+                    self._responder(ErroResp('pedido inválido'))
+                    continue
+                cmd, args = pedido[0].upper(), pedido[1:]
+                try:
+                    resposta = self._executar(estado, cmd, args)
+                    if resposta is not _SEM_RESPOSTA:
+                        self._responder(resposta)
+                except (ValueError, IndexError) as e:
+                    self._responder(ErroResp(str(e) or 'argumentos inválidos'))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            for canal in self._canais:
+                estado.unsubscribe(canal, self._entregar)
+
+    def _executar(self, estado, cmd, args):
+        if cmd == 'PING':
+            return 'PONG'
+        if cmd in ('AUTH', 'SELECT'):
+            return 'OK'
+        if cmd == 'GET':
+            return estado.get(args[0])
+        if cmd == 'MGET':
+            return estado.mget(*args)
+        if cmd == 'SET':
+            opcoes = [a.upper() for a in args[2:]]
+            px = int(args[2 + opcoes.index('PX') + 1]) if 'PX' in opcoes else None
+            if 'EX' in opcoes:
+                px = int(args[2 + opcoes.index('EX') + 1]) * 1000
+            return 'OK' if estado.set(args[0], args[1], nx='NX' in opcoes, px=px) else None
+        if cmd == 'INCR':
+            return estado.incr(args[0])
+        if cmd == 'INCRBY':
+            return estado.incr(args[0], int(args[1]))
+        if cmd == 'ZADD':
+            # Só a forma usada pela aplicação: ZADD chave GT valor membro [valor membro ...]
+            if len(args) < 4 or args[1].upper() != 'GT' or len(args) % 2:
+                raise ValueError('só é suportado ZADD chave GT valor membro ...')
+            pares = args[2:]
+            return estado.atualizar_maximos(args[0], {pares[i + 1]: int(float(pares[i]))
+                                                      for i in range(0, len(pares), 2)})
+        if cmd == 'ZRANGE':
+            # ZRANGE chave 0 -1 WITHSCORES
+            maximos = sorted(estado.maximos(args[0]).items(), key=lambda item: (item[1], item[0]))
+            if len(args) > 3 and args[3].upper() == 'WITHSCORES':
+                return [v for membro, valor in maximos for v in (membro, str(valor))]
+            return [membro for membro, _ in maximos]
+        if cmd == 'EXPIRE':
+            return estado.expire(args[0], int(args[1]))
+        if cmd == 'DEL':
+            return estado.delete(*args)
+        if cmd == 'PUBLISH':
+            return estado.publish(args[0], args[1])
+        if cmd == 'SUBSCRIBE':
+            for canal in args:
+                if canal not in self._canais:
+                    self._canais.append(canal)
+                    estado.subscribe(canal, self._entregar)
+                self._responder(['subscribe', canal, len(self._canais)])
+            return _SEM_RESPOSTA
+        raise ValueError(f"comando desconhecido '{cmd}'")
+
+    def finish(self):
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+
+class ServidorResp:
+    """Substituto local do Redis sobre EstadoMemoria (socket Unix ou TCP)"""
+
+    def __init__(self, url):
+        url = urlparse(url)
+        if url.scheme == 'unix':
+            if os.path.exists(url.path):
+                os.remove(url.path)
+            self._servidor = socketserver.ThreadingUnixStreamServer(url.path, _HandlerResp)
+        else:
+            socketserver.ThreadingTCPServer.allow_reuse_address = True
+            porta = 6379 if url.port is None else url.port  # 0: porta livre escolhida pelo sistema
+            self._servidor = socketserver.ThreadingTCPServer((url.hostname or '127.0.0.1', porta), _HandlerResp)
+        self._servidor.daemon_threads = True
+        self._servidor.estado = EstadoMemoria()
+
+    @property
+    def endereco(self):
+        return self._servidor.server_address
+
+    def iniciar(self):
+        """Servir numa thread em segundo plano"""
+        thread = threading.Thread(target=self._servidor.serve_forever, name='servidor-resp', daemon=True)
+        thread.start()
+        return thread
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+if __name__ == '__main__':
+    # python estado_partilhado.py [unix:///tmp/satisfacao-estado.sock | redis://127.0.0.1:6390]
+    import sys
+
+    url = sys.argv[1] if len(sys.argv) > 1 else 'unix:///tmp/satisfacao-estado.sock'
+    servidor = ServidorResp(url)
+    print(f'Estado partilhado local em {url} (Ctrl+C para sair)')
+    try:
+        servidor.iniciar().join()
+    except KeyboardInterrupt:
+        servidor.parar()
@@ -0,0 +1,22 @@
+"""Configuração do gunicorn (carregada automaticamente a partir da pasta do projeto)"""
+import os
+
+
+def on_starting(server):
+    """Com ESTADO_SERVIDOR_LOCAL=1, servir o estado partilhado a partir do master (sem Redis)"""
+    if os.environ.get('ESTADO_SERVIDOR_LOCAL') == '1':
+        from estado_partilhado import ServidorResp
+
+        url = os.environ.setdefault('ESTADO_URL', 'unix:///tmp/satisfacao-estado.sock')
+        server.estado_partilhado = ServidorResp(url)
+        server.estado_partilhado.iniciar()
+        server.log.info('Estado partilhado local em %s', url)
+
+
+def post_worker_init(worker):
+    """Preparar a BD e aquecer caches em cada worker antes de aceitar pedidos"""
+    import app
+
+    app.init_db()
+    if os.environ.get('WARMUP', '1') == '1':
+        app.aquecer()
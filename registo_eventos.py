@@ -0,0 +1,265 @@
+"""Registo de eventos de voto: ficheiros binários só de acréscimo, em segmentos.
+
+Cada voto ocupa um registo de 24 bytes (id, instante UTC, dia ordinal, número
+sequencial, minuto do dia, tipo) a seguir a um cabeçalho de 16 bytes. Um
+segmento fecha ao atingir registos_por_segmento e recebe um índice JSON ao
+lado (intervalos de ids e de dias, posição de cada dia), que permite saltar
+segmentos e ir direto aos dias pedidos. Os segmentos são lidos com mmap; com
+NumPy a reprodução é vetorizada sobre a própria memória mapeada.
+
+Vários processos podem escrever no mesmo diretório: cada escrita corre com um
+lock de ficheiro (fcntl), que também serializa a rotação dos segmentos.
+"""
+from contextlib import contextmanager
+import json
+import mmap
+import os
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGICO = b'SATVOTO1'
+VERSAO = 1
+CABECALHO = struct.Struct('<8sII')    # mágico, tamanho do registo, versão
+REGISTO = struct.Struct('<QIIIHBx')   # id, instante, dia, seq, minuto, tipo
+
+if np is not None:
+    DTYPE = np.dtype([('id', '<u8'), ('instante', '<u4'), ('dia', '<u4'), ('seq', '<u4'),
+                      ('minuto', '<u2'), ('tipo', 'u1'), ('_', 'u1')])
+
+
+class ErroRegisto(Exception):
+    """Segmento com formato inválido"""
+
+
+class RegistoEventos:
+    """Registo segmentado de votos, com escrita por acréscimo e reprodução"""
+
+    def __init__(self, diretorio, registos_por_segmento=1000000, fsync=False):
+        self.diretorio = diretorio
+        self.registos_por_segmento = registos_por_segmento
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._f = None
+        self._numero = None
+        self._trinco_f = None
+        self._indices = {}
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, numero, extensao='seg'):
+        return os.path.join(self.diretorio, f'votos-{numero:06d}.{extensao}')
+
+    def segmentos(self):
+        """Números dos segmentos existentes, por ordem"""
+        return sorted(int(nome[6:12]) for nome in os.listdir(self.diretorio)
+                      if nome.startswith('votos-') and nome.endswith('.seg'))
+
+    # Escrita
+
+    @contextmanager
+    def _trinco(self):
+        """Lock exclusivo entre processos (sem fcntl, só entre threads)"""
+        if fcntl is None:
+            yield
+            return
+        if self._trinco_f is None:
+            self._trinco_f = open(os.path.join(self.diretorio, 'votos.lock'), 'a')
+        fcntl.flock(self._trinco_f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._trinco_f, fcntl.LOCK_UN)
+
+    def _abrir(self, numero):
+        """Abrir um segmento para acréscimo, escrevendo o cabeçalho se for novo"""
+        f = open(self._caminho(numero), 'ab')
+        if f.tell() == 0:
+            f.write(CABECALHO.pack(MAGICO, REGISTO.size, VERSAO))
+            f.flush()
+        self._f, self._numero = f, numero
+
+    def _livres(self):
+        """Registos que ainda cabem no segmento ativo, rodando-o se estiver cheio (com o trinco)"""
+        if self._f is None:
+            segmentos = self.segmentos()
+            self._abrir(segmentos[-1] if segmentos else 1)
+        fd = self._f.fileno()
+        tamanho = os.fstat(fd).st_size - CABECALHO.size
+        resto = tamanho % REGISTO.size
+        if resto:
+            # Escrita interrompida a meio (processo morto): descartar o registo incompleto
+            os.ftruncate(fd, os.fstat(fd).st_size - resto)
+            tamanho -= resto
+        n = tamanho // REGISTO.size
+        if n < self.registos_por_segmento:
+            return self.registos_por_segmento - n
+
+        ultimo = self.segmentos()[-1]
+        self._f.close()
+        if ultimo == self._numero:
+            self.escrever_indice(self._numero)
+            ultimo += 1
+        self._abrir(ultimo)
+        return self._livres()
+
+    def acrescentar(self, id, instante, dia, minuto, tipo, seq):
+        """Acrescentar um voto (instante em segundos UTC, dia ordinal, minuto desde a meia-noite)"""
+        self.acrescentar_muitos([(id, instante, dia, seq, minuto, tipo)])
+
+    def acrescentar_muitos(self, registos):
+        """Acrescentar tuplos (id, instante, dia, seq, minuto, tipo) numa só escrita por segmento"""
+        registos = list(registos)
+        with self._lock, self._trinco():
+            i = 0
+            while i < len(registos):
+                lote = registos[i:i + self._livres()]
+                self._f.write(b''.join(REGISTO.pack(*r) for r in lote))
+                self._f.flush()
+                i += len(lote)
+            if self.fsync and self._f is not None:
+                os.fsync(self._f.fileno())
+
+    def fechar(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+    # Leitura
+
+    def _mapear(self, numero):
+        """Devolver (memória mapeada, número de registos) de um segmento"""
+        with open(self._caminho(numero), 'rb') as f:
+            tamanho = os.fstat(f.fileno()).st_size
+            if tamanho < CABECALHO.size:
+                return None, 0
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, tamanho_registo, versao = CABECALHO.unpack_from(m, 0)
+        if magico != MAGICO or tamanho_registo != REGISTO.size:
+            raise ErroRegisto(f'Segmento {numero} com formato inválido')
+        return m, (tamanho - CABECALHO.size) // REGISTO.size
+
+    def _registos(self, m, n, a=0, b=None):
+        """Registos a..b de um segmento: array estruturado NumPy ou lista de tuplos"""
+        b = n if b is None else b
+        if np is not None:
+            return np.frombuffer(m, dtype=DTYPE, count=n, offset=CABECALHO.size)[a:b]
+        inicio = CABECALHO.size + a * REGISTO.size
+        return list(REGISTO.iter_unpack(m[inicio:CABECALHO.size + b * REGISTO.size]))
+
+    def _calcular_indice(self, numero):
+        """Índice de um segmento: intervalos de ids e dias e [primeiro, fim) de cada dia"""
+        m, n = self._mapear(numero)
+        indice = {'registos': n, 'id_min': None, 'id_max': None, 'dia_min': None, 'dia_max': None, 'dias': {}}
+        if not n:
+            return indice
+        registos = self._registos(m, n)
+        if np is not None:
+            ids, dias = registos['id'], registos['dia']
+            valores, primeiros = np.unique(dias, return_index=True)
+            _, ultimos = np.unique(dias[::-1], return_index=True)
+            posicoes = {int(d): [int(p), n - int(u)] for d, p, u in zip(valores, primeiros, ultimos)}
+            indice.update(id_min=int(ids.min()), id_max=int(ids.max()))
+        else:
+            posicoes = {}
+            for i, r in enumerate(registos):
+                posicoes.setdefault(r[2], [i, i + 1])[1] = i + 1
+            ids = [r[0] for r in registos]
+            indice.update(id_min=min(ids), id_max=max(ids))
+        indice.update(dia_min=min(posicoes), dia_max=max(posicoes),
+                      dias={str(d): p for d, p in sorted(posicoes.items())})
+        return indice
+
+    def escrever_indice(self, numero):
+        """Gravar o índice de um segmento fechado (ficheiro .idx ao lado)"""
+        indice = self._calcular_indice(numero)
+        temporario = self._caminho(numero, 'idx.tmp')
+        with open(temporario, 'w') as f:
+            json.dump(indice, f)
+        os.replace(temporario, self._caminho(numero, 'idx'))
+        return indice
+
+    def indice(self, numero):
+        """Índice de um segmento (em cache enquanto o segmento não crescer; depois do .idx ou calculado)"""
+        registos = (os.path.getsize(self._caminho(numero)) - CABECALHO.size) // REGISTO.size
+        indice = self._indices.get(numero)
+        if indice is not None and indice['registos'] == registos:
+            return indice
+        try:
+            with open(self._caminho(numero, 'idx')) as f:
+                indice = json.load(f)
+            if indice['registos'] != registos:
+                indice = None
+        except (OSError, ValueError, KeyError):
+            indice = None
+        if indice is None:
+            indice = self._calcular_indice(numero)
+        self._indices[numero] = indice
+        return indice
+
+    def ultimo_id(self):
+        """Maior id registado (0 se vazio)"""
+        ids = [self.indice(numero)['id_max'] for numero in self.segmentos()]
+        return max([i for i in ids if i is not None], default=0)
+
+    def lotes(self, inicio=None, fim=None):
+        """Iterar os registos por segmento, só com os dias inicio..fim (ordinais, inclusive).
+
+        Com NumPy cada lote é um array estruturado (campos id, instante, dia,
+        seq, minuto, tipo); sem NumPy é uma lista de tuplos na mesma ordem.
+        """
+        inicio = 0 if inicio is None else inicio
+        fim = 2 ** 32 - 1 if fim is None else fim
+        for numero in self.segmentos():
+            indice = self.indice(numero)
+            if not indice['registos'] or indice['dia_max'] < inicio or indice['dia_min'] > fim:
+                continue
+            posicoes = [p for d, p in indice['dias'].items() if inicio <= int(d) <= fim]
+            if not posicoes:
+                continue  # o intervalo cai numa lacuna entre os dias do segmento
+            a, b = min(p[0] for p in posicoes), max(p[1] for p in posicoes)
+            m, n = self._mapear(numero)
+            registos = self._registos(m, n, a, b)
+            # Dias intercalados (vários processos à meia-noite) podem cair no intervalo
+            if np is not None:
+                if indice['dia_min'] < inicio or indice['dia_max'] > fim:
+                    registos = registos[(registos['dia'] >= inicio) & (registos['dia'] <= fim)]
+            else:
+                registos = [r for r in registos if inicio <= r[2] <= fim]
+            if len(registos):
+                yield registos
+
+    def totais_diarios(self, inicio=None, fim=None):
+        """{(dia, tipo): [votos, maior número sequencial]} reconstruído a partir do registo"""
+        result = {}
+        for registos in self.lotes(inicio, fim):
+            if np is not None:
+                chave = registos['dia'].astype(np.int64) * 256 + registos['tipo']
+                chaves, posicao, votos = np.unique(chave, return_inverse=True, return_counts=True)
+                maximos = np.zeros(len(chaves), dtype=np.uint32)
+                np.maximum.at(maximos, posicao, registos['seq'])
+                parciais = zip(chaves.tolist(), votos.tolist(), maximos.tolist())
+                parciais = [((k // 256, k % 256), v, s) for k, v, s in parciais]
+            else:
+                contagem = {}
+                for r in registos:
+                    total = contagem.setdefault((r[2], r[5]), [0, 0])
+                    total[0] += 1
+                    if r[3] > total[1]:
+                        total[1] = r[3]
+                parciais = [(k, v, s) for k, (v, s) in contagem.items()]
+            for chave, votos, seq in parciais:
+                total = result.setdefault(chave, [0, 0])
+                total[0] += votos
+                if seq > total[1]:
+                    total[1] = seq
+        return result
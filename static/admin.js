@@ -0,0 +1,317 @@
+let currentPage = 1;
+let charts = {};
+const TIPOS = carregarTipos();
+const CORES = ['#28a745', '#ffc107', '#dc3545', '#17a2b8', '#6f42c1', '#fd7e14', '#20c997', '#6c757d'];
+
+// Opções do inquérito (incluindo as desativadas) enviadas pelo servidor na página
+function carregarTipos() {
+    const tipos = {};
+    const dados = document.getElementById('opcoes-inquerito');
+    if (dados) {
+        JSON.parse(dados.textContent).forEach(opcao => {
+            tipos[opcao.id] = opcao;
+        });
+    }
+    return tipos;
+}
+
+// Opções ativas, pela ordem configurada
+function tiposAtivos() {
+    return Object.values(TIPOS)
+        .filter(opcao => opcao.ativo)
+        .sort((a, b) => a.ordem - b.ordem || a.id - b.id)
+        .map(opcao => opcao.id);
+}
+
+// Nome a mostrar de um tipo (opção criada depois de a página abrir: nome genérico)
+function nomeTipo(tipo) {
+    const opcao = TIPOS[tipo];
+    return opcao ? `${opcao.emoji} ${opcao.nome}`.trim() : `Opção ${tipo}`;
+}
+
+function escapeHtml(texto) {
+    const div = document.createElement('div');
+    div.textContent = texto;
+    return div.innerHTML;
+}
+
+function somar(stats) {
+    return Object.values(stats || {}).reduce((total, valor) => total + (valor || 0), 0);
+}
+
+// Carregar dados ao abrir
+document.addEventListener('DOMContentLoaded', () => {
+    loadResumoGeral();
+    loadStatsHoje();
+    loadTemporal();
+    loadHistorico(1);
+    setInterval(loadResumoGeral, 30000); // Atualizar a cada 30s
+});
+
+async function loadResumoGeral() {
+    try {
+        const response = await fetch('/api/admin/resumo-geral');
+        const data = await response.json();
+
+        document.getElementById('totalGeral').textContent = data.total_geral;
+        tiposAtivos().forEach(tipo => {
+            const cartao = document.getElementById(`statTipo${tipo}`);
+            if (cartao) cartao.textContent = data.stats_geral[tipo] || 0;
+        });
+        document.getElementById('totalHoje').textContent = somar(data.stats_hoje);
+
+        // Taxa de satisfação: votos nas opções marcadas como positivas
+        const taxaSatisfacao = document.getElementById('taxaSatisfacao');
+        if (taxaSatisfacao) {
+            const satisfeitos = Object.values(TIPOS)
+                .filter(opcao => opcao.positiva)
+                .reduce((soma, opcao) => soma + (data.stats_geral[opcao.id] || 0), 0);
+            const total = data.total_geral || 1;
+            taxaSatisfacao.textContent = Math.round((satisfeitos / total) * 100) + '%';
+        }
+
+        updateChartsGeral(data.stats_geral);
+        updateChartsHoje(data.stats_hoje);
+    } catch (error) {
+        console.error('Erro ao carregar resumo geral:', error);
+    }
+}
+
+// Regenerar já os relatórios pré-calculados no servidor
+async function atualizarRelatorios() {
+    const btn = document.getElementById('btnAtualizar');
+    btn.disabled = true;
+    try {
+        const response = await fetch('/api/admin/relatorios/atualizar', { method: 'POST' });
+        if (!response.ok) {
+            throw new Error(`Erro HTTP: ${response.status}`);
+        }
+        await Promise.all([loadResumoGeral(), loadTemporal()]);
+    } catch (error) {
+        console.error('Erro ao atualizar relatórios:', error);
+    } finally {
+        btn.disabled = false;
+    }
+}
+
+function updateChartsGeral(stats) {
+    const ctx = document.getElementById('chartGeral');
+    if (!ctx) return;
+
+    if (charts.geral) {
+        charts.geral.data.datasets[0].data = tiposAtivos().map(tipo => stats[tipo] || 0);
+        charts.geral.update();
+    } else {
+        charts.geral = new Chart(ctx, {
+            type: 'doughnut',
+            data: {
+                labels: tiposAtivos().map(nomeTipo),
+                datasets: [{
+                    data: tiposAtivos().map(tipo => stats[tipo] || 0),
+                    backgroundColor: tiposAtivos().map((_, i) => CORES[i % CORES.length]),
+                    borderColor: 'white',
+                    borderWidth: 2
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: {
+                        position: 'bottom',
+                        labels: { font: { size: 13 }, padding: 15 }
+                    }
+                }
+            }
+        });
+    }
+}
+
+function updateChartsHoje(stats) {
+    const ctx = document.getElementById('chartHoje');
+    if (!ctx) return;
+
+    if (charts.hoje) {
+        charts.hoje.data.datasets[0].data = tiposAtivos().map(tipo => stats[tipo] || 0);
+        charts.hoje.update();
+    } else {
+        charts.hoje = new Chart(ctx, {
+            type: 'bar',
+            data: {
+                labels: tiposAtivos().map(nomeTipo),
+                datasets: [{
+                    label: 'Avaliações',
+                    data: tiposAtivos().map(tipo => stats[tipo] || 0),
+                    backgroundColor: tiposAtivos().map((_, i) => CORES[i % CORES.length])
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: { display: true }
+                },
+                scales: {
+                    y: { beginAtZero: true }
+                }
+            }
+        });
+    }
+}
+
+async function loadStatsHoje() {
+    try {
+        const response = await fetch('/api/stats');
+        const data = await response.json();
+        updateChartsHoje(data);
+    } catch (error) {
+        console.error('Erro ao carregar stats de hoje:', error);
+    }
+}
+
+async function loadTemporal() {
+    try {
+        const content = document.getElementById('temporalContent');
+        content.innerHTML = '<div class="loading">Carregando dados temporais...</div>';
+
+        const response = await fetch('/api/admin/stats-temporal');
+        const data = await response.json();
+
+        if (data.length === 0) {
+            content.innerHTML = '<p style="text-align: center; color: #999; padding: 40px;">Sem dados disponíveis</p>';
+            return;
+        }
+
+        // Agrupar por data; uma coluna por opção ativa e por cada outro tipo com votos
+        const byDate = {};
+        const colunas = tiposAtivos();
+        data.forEach(item => {
+            if (!byDate[item.avaliacao_date]) {
+                byDate[item.avaliacao_date] = {};
+            }
+            byDate[item.avaliacao_date][item.tipo] = item.total;
+            if (!colunas.includes(item.tipo)) {
+                colunas.push(item.tipo);
+            }
+        });
+
+        let html = '<table class="historico-table"><thead><tr>';
+        html += '<th>Data</th>';
+        colunas.forEach(tipo => {
+            html += `<th>${escapeHtml(nomeTipo(tipo))}</th>`;
+        });
+        html += '<th>Total</th><th>Comparação</th>';
+        html += '</tr></thead><tbody>';
+
+        const dates = Object.keys(byDate).sort().reverse();
+
+        for (let i = 0; i < dates.length; i++) {
+            const date = dates[i];
+            const stats = byDate[date];
+            const total = somar(stats);
+
+            // Comparar com dia anterior
+            let comparison = '';
+            if (i < dates.length - 1) {
+                const prevDate = dates[i + 1];
+                const prevStats = byDate[prevDate];
+                const prevTotal = somar(prevStats);
+                const diff = total - prevTotal;
+                const diffPercent = prevTotal > 0 ? ((diff / prevTotal) * 100).toFixed(1) : 0;
+
+                if (diff > 0) {
+                    comparison = `<span style="color: #28a745; font-weight: bold;">↑ +${diff} (+${diffPercent}%)</span>`;
+                } else if (diff < 0) {
+                    comparison = `<span style="color: #dc3545; font-weight: bold;">↓ ${diff} (${diffPercent}%)</span>`;
+                } else {
+                    comparison = `<span style="color: #999;">= Igual</span>`;
+                }
+            } else {
+                comparison = '<span style="color: #999;">Primeiro dia</span>';
+            }
+
+            html += `<tr>
+                <td><strong>${date}</strong></td>
+                ${colunas.map(tipo => `<td style="text-align: center;">${stats[tipo] || 0}</td>`).join('')}
+                <td style="text-align: center; font-weight: bold;">${total}</td>
+                <td style="text-align: center;">${comparison}</td>
+            </tr>`;
+        }
+
+        html += '</tbody></table>';
+        content.innerHTML = html;
+    } catch (error) {
+        console.error('Erro ao carregar dados temporais:', error);
+        document.getElementById('temporalContent').innerHTML = '<p style="color: red;">Erro ao carregar</p>';
+    }
+}
+
+async function loadHistorico(page) {
+    try {
+        const content = document.getElementById('historicoContent');
+        content.innerHTML = '<div class="loading">Carregando histórico...</div>';
+
+        const response = await fetch(`/api/admin/historico?page=${page}&formato=compacto`);
+
+        if (!response.ok) {
+            throw new Error(`Erro HTTP: ${response.status}`);
+        }
+
+        const data = await response.json();
+
+        if (!data || !data.historico) {
+            content.innerHTML = '<p style="text-align: center; color: #999; padding: 40px;">Sem dados disponíveis</p>';
+            return;
+        }
+
+        if (data.historico.length === 0) {
+            content.innerHTML = '<p style="text-align: center; color: #999; padding: 40px;">Sem dados disponíveis</p>';
+            return;
+        }
+
+        const [iTipo, iData, iHora, iNumero] = ['tipo', 'avaliacao_date', 'avaliacao_time', 'sequential_number']
+            .map(coluna => data.colunas.indexOf(coluna));
+        let html = '<table class="historico-table"><thead><tr>';
+        html += '<th>Data</th><th>Hora</th><th>Tipo</th><th>Número</th>';
+        html += '</tr></thead><tbody>';
+
+        data.historico.forEach(linha => {
+            html += `<tr>
+                <td>${linha[iData]}</td>
+                <td>${linha[iHora]}</td>
+                <td><span class="tipo-badge tipo-${linha[iTipo]}">${escapeHtml(nomeTipo(linha[iTipo]))}</span></td>
+                <td style="text-align: center;">#${linha[iNumero]}</td>
+            </tr>`;
+        });
+
+        html += '</tbody></table>';
+        content.innerHTML = html;
+
+        // Atualizar paginação
+        updatePagination(data.page, data.pages);
+        currentPage = page;
+    } catch (error) {
+        console.error('Erro ao carregar histórico:', error);
+        document.getElementById('historicoContent').innerHTML = '<p style="color: red;">Erro ao carregar</p>';
+    }
+}
+
+function updatePagination(current, total) {
+    const container = document.getElementById('pagination');
+    let html = '';
+
+    if (current > 1) {
+        html += `<button onclick="loadHistorico(${current - 1})">← Anterior</button>`;
+    }
+
+    for (let i = Math.max(1, current - 2); i <= Math.min(total, current + 2); i++) {
+        const activeClass = i === current ? 'active' : '';
+        html += `<button class="${activeClass}" onclick="loadHistorico(${i})">${i}</button>`;
+    }
+
+    if (current < total) {
+        html += `<button onclick="loadHistorico(${current + 1})">Próxima →</button>`;
+    }
+
+    container.innerHTML = html;
+}
@@ -30,12 +30,15 @@ async function loadStats() {
         if (response.ok) {
             const stats = await response.json();
             
-            // Atualizar números
-            document.getElementById('stat-1').textContent = stats[1] || 0;
-            document.getElementById('stat-2').textContent = stats[2] || 0;
-            document.getElementById('stat-3').textContent = stats[3] || 0;
-            
-            const total = (stats[1] || 0) + (stats[2] || 0) + (stats[3] || 0);
+            // Atualizar números (um cartão por opção ativa, vindos do servidor)
+            let total = 0;
+            Object.keys(stats).forEach(tipo => {
+                total += stats[tipo] || 0;
+                const stat = document.getElementById(`stat-${tipo}`);
+                if (stat) {
+                    stat.textContent = stats[tipo] || 0;
+                }
+            });
             document.getElementById('stat-total').textContent = total;
             
             // Atualizar gráficos
@@ -48,59 +51,58 @@ async function loadStats() {
 
 // Atualizar gráfico
 function updateChart(stats, total) {
-    if (total === 0) {
-        for (let i = 1; i <= 3; i++) {
-            document.getElementById(`bar-fill-${i}`).style.width = '0%';
-            document.querySelector(`#bar-${i} .bar-label`).textContent = '0%';
+    Object.keys(stats).forEach(tipo => {
+        const fill = document.getElementById(`bar-fill-${tipo}`);
+        const label = document.querySelector(`#bar-${tipo} .bar-label`);
+        if (!fill || !label) {
+            return;
         }
-        return;
-    }
-    
-    for (let i = 1; i <= 3; i++) {
-        const count = stats[i] || 0;
-        const percentage = Math.round((count / total) * 100);
-        
-        document.getElementById(`bar-fill-${i}`).style.width = percentage + '%';
-        document.querySelector(`#bar-${i} .bar-label`).textContent = percentage + '%';
-    }
+        const percentage = total === 0 ? 0 : Math.round(((stats[tipo] || 0) / total) * 100);
+        fill.style.width = percentage + '%';
+        label.textContent = percentage + '%';
+    });
 }
 
+// Histórico incremental: só pedimos as avaliações novas (after_id)
+const MAX_HISTORY = 100;
+const TIPOS = carregarTipos();
+let lastId = 0;
+let historyDate = null;
+
 // Carregar histórico
 async function loadHistory() {
     try {
-        const response = await fetch('/api/avaliacoes');
+        const response = await fetch(`/api/avaliacoes?after_id=${lastId}&formato=compacto`);
         if (response.ok) {
             const data = await response.json();
+            data.avaliacoes = fromCompact(data.colunas, data.avaliacoes);
             const historyList = document.getElementById('history-list');
             
+            // Novo dia: recomeçar a lista
+            if (data.date !== historyDate) {
+                historyDate = data.date;
+                if (lastId !== 0) {
+                    lastId = 0;
+                    historyList.innerHTML = '';
+                    return loadHistory();
+                }
+            }
+            
             if (data.avaliacoes && data.avaliacoes.length > 0) {
-                historyList.innerHTML = '';
+                if (lastId === 0) {
+                    historyList.innerHTML = '';
+                }
+                lastId = data.avaliacoes[0].id;
                 
-                const tipos = {
-                    1: { emoji: '😀', label: 'Muito Satisfeito' },
-                    2: { emoji: '🙂', label: 'Satisfeito' },
-                    3: { emoji: '😞', label: 'Insatisfeito' }
-                };
+                // Vêm do mais recente para o mais antigo: inserir no topo por ordem inversa
+                for (let i = data.avaliacoes.length - 1; i >= 0; i--) {
+                    historyList.prepend(createHistoryItem(data.avaliacoes[i]));
+                }
                 
-                data.avaliacoes.forEach(avaliacao => {
-                    const item = document.createElement('div');
-                    item.className = 'history-item';
-                    
-                    const tipo = tipos[avaliacao.tipo];
-                    
-                    item.innerHTML = `
-                        <div class="history-item-left">
-                            <span class="history-emoji">${tipo.emoji}</span>
-                            <div>
-                                <div class="history-label">${tipo.label}</div>
-                                <div class="history-time">#${avaliacao.sequential_number} às ${avaliacao.avaliacao_time}</div>
-                            </div>
-                        </div>
-                    `;
-                    
-                    historyList.appendChild(item);
-                });
-            } else {
+                while (historyList.children.length > MAX_HISTORY) {
+                    historyList.lastElementChild.remove();
+                }
+            } else if (lastId === 0) {
                 historyList.innerHTML = '<p class="empty-message">Nenhuma avaliação registada hoje</p>';
             }
         }
@@ -108,3 +110,54 @@ async function loadHistory() {
         console.error('Erro ao carregar histórico:', error);
     }
 }
+
+// Converter formato compacto (colunas + listas) em objetos
+function fromCompact(colunas, linhas) {
+    return linhas.map(linha => {
+        const obj = {};
+        colunas.forEach((coluna, i) => {
+            obj[coluna] = linha[i];
+        });
+        return obj;
+    });
+}
+
+// Opções do inquérito (incluindo as desativadas) enviadas pelo servidor na página
+function carregarTipos() {
+    const tipos = {};
+    const dados = document.getElementById('opcoes-inquerito');
+    if (dados) {
+        JSON.parse(dados.textContent).forEach(opcao => {
+            tipos[opcao.id] = { emoji: opcao.emoji, label: opcao.nome };
+        });
+    }
+    return tipos;
+}
+
+// Nome e emoji de um tipo (opção criada depois de a página abrir: nome genérico)
+function tipoInfo(tipo) {
+    return TIPOS[tipo] || { emoji: '•', label: `Opção ${tipo}` };
+}
+
+// Criar linha do histórico
+function createHistoryItem(avaliacao) {
+    const item = document.createElement('div');
+    item.className = 'history-item';
+    
+    const tipo = tipoInfo(avaliacao.tipo);
+    
+    item.innerHTML = `
+        <div class="history-item-left">
+            <span class="history-emoji"></span>
+            <div>
+                <div class="history-label"></div>
+                <div class="history-time">#${avaliacao.sequential_number} às ${avaliacao.avaliacao_time}</div>
+            </div>
+        </div>
+    `;
+    // Nomes configurados no painel: inserir como texto
+    item.querySelector('.history-emoji').textContent = tipo.emoji;
+    item.querySelector('.history-label').textContent = tipo.label;
+    
+    return item;
+}
@@ -1,7 +1,8 @@
 // Inicializar
 let isProcessing = false;
 const TIMEOUT_MS = 2000; // 2 segundos de timeout
-let currentDateKey = new Date().toDateString();
+let currentDay = null; // dia de negócio do servidor (fuso do local, não do browser)
+const KIOSK_ID = getKioskId();
 
 document.addEventListener('DOMContentLoaded', () => {
     loadStats();
@@ -9,6 +10,16 @@ document.addEventListener('DOMContentLoaded', () => {
     startDailyResetWatcher();
 });
 
+// Identificador persistente deste quiosque (limitação de pedidos no servidor)
+function getKioskId() {
+    let id = localStorage.getItem('kioskId');
+    if (!id) {
+        id = Math.random().toString(36).slice(2, 10);
+        localStorage.setItem('kioskId', id);
+    }
+    return id;
+}
+
 // Adicionar listeners
 function attachButtonListeners() {
     document.querySelectorAll('.satisfaction-button').forEach(button => {
@@ -16,20 +27,13 @@ function attachButtonListeners() {
     });
 }
 
-// Verificar mudança de dia e resetar contadores
+// Verificar mudança de dia (decidida pelo servidor) e resetar contadores
 function startDailyResetWatcher() {
-    setInterval(() => {
-        const newDateKey = new Date().toDateString();
-        if (newDateKey !== currentDateKey) {
-            currentDateKey = newDateKey;
-            resetCounters();
-            loadStats();
-        }
-    }, 60000); // verificar a cada 1 minuto
+    setInterval(loadStats, 60000); // verificar a cada 1 minuto
 }
 
 // Tratar clique
-async function handleButtonClick(event) {
+function handleButtonClick(event) {
     // Verificar se já está a processar
     if (isProcessing) {
         return;
@@ -42,30 +46,47 @@ async function handleButtonClick(event) {
     isProcessing = true;
     disableAllButtons();
     
+    // Feedback imediato: o quiosque não espera pela resposta
+    animateButton(button);
+    registarVoto(tipo);
+    
+    // Reativar botões após timeout
+    setTimeout(() => {
+        isProcessing = false;
+        enableAllButtons();
+    }, TIMEOUT_MS);
+}
+
+// Id único de cada voto: o servidor ignora um reenvio do mesmo voto
+function novoVotoId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${KIOSK_ID}-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+}
+
+// Enviar voto pelo endpoint rápido (form compacto, resposta já traz os contadores)
+async function registarVoto(tipo) {
+    const payload = new URLSearchParams({ tipo: tipo, v: novoVotoId() });
     try {
-        const response = await fetch('/api/avaliar', {
+        const response = await fetch(`/api/k?k=${KIOSK_ID}`, {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ tipo: tipo })
+            body: payload,
+            keepalive: true
         });
 
         if (response.ok) {
             const data = await response.json();
-            
-            updateCounter(tipo, data.sequential_number);
-            animateButton(button);
-            showPopup(tipo, data.sequential_number, data.time);
+            updateCounters(data.c);
+            showPopup(tipo, data.n, data.h);
         }
     } catch (error) {
+        // Sem resposta (rede instável): entregar o voto em segundo plano. Se o pedido
+        // anterior chegou a ser gravado, o mesmo id faz o servidor ignorar este
+        if (navigator.sendBeacon && navigator.sendBeacon(`/api/k?k=${KIOSK_ID}`, payload)) {
+            return;
+        }
         console.error('Erro:', error);
-    } finally {
-        // Reativar botões após timeout
-        setTimeout(() => {
-            isProcessing = false;
-            enableAllButtons();
-        }, TIMEOUT_MS);
     }
 }
 
@@ -89,27 +110,34 @@ function enableAllButtons() {
 
 // Atualizar contador
 function updateCounter(tipo, count) {
-    document.getElementById(`count-${tipo}`).textContent = count;
+    const counter = document.getElementById(`count-${tipo}`);
+    if (counter) {
+        counter.textContent = count;
+    }
+}
+
+// Atualizar todos os contadores
+function updateCounters(stats) {
+    Object.keys(stats).forEach(tipo => {
+        updateCounter(tipo, stats[tipo]);
+    });
 }
 
 // Reset visual dos contadores
 function resetCounters() {
-    document.getElementById('count-1').textContent = '0';
-    document.getElementById('count-2').textContent = '0';
-    document.getElementById('count-3').textContent = '0';
+    document.querySelectorAll('.counter').forEach(counter => {
+        counter.textContent = '0';
+    });
 }
 
 // Mostrar pop-up
 function showPopup(tipo, sequential, time) {
-    const tipos = {
-        1: 'Muito Satisfeito',
-        2: 'Satisfeito',
-        3: 'Insatisfeito'
-    };
+    // Nome da opção tal como aparece no botão (opções configuradas no servidor)
+    const label = document.querySelector(`.satisfaction-button[data-tipo="${tipo}"] .button-label`);
     
     const popup = document.getElementById('info-popup');
     
-    document.getElementById('popup-tipo').textContent = tipos[tipo];
+    document.getElementById('popup-tipo').textContent = label ? label.textContent : tipo;
     document.getElementById('popup-number').textContent = sequential;
     document.getElementById('popup-time').textContent = time;
     
@@ -134,9 +162,12 @@ async function loadStats() {
         const response = await fetch('/api/stats');
         if (response.ok) {
             const stats = await response.json();
-            Object.keys(stats).forEach(tipo => {
-                updateCounter(tipo, stats[tipo]);
-            });
+            const day = response.headers.get('X-Dia');
+            if (currentDay !== null && day !== currentDay) {
+                resetCounters();
+            }
+            currentDay = day;
+            updateCounters(stats);
         }
     } catch (error) {
         console.error('Erro ao carregar estatísticas:', error);
@@ -0,0 +1,134 @@
+"""Testes do estado partilhado: os dois backends com a mesma bateria.
+
+EstadoResp é testado contra o ServidorResp local, por socket Unix e por TCP.
+
+Uso: python -m unittest discover tests  (ou pytest)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estado_partilhado import EstadoMemoria, EstadoResp, ServidorResp  # noqa: E402
+
+
+class _TestesEstado:
+    """Bateria comum; as subclasses definem self.estado"""
+
+    def test_get_set(self):
+        self.assertIsNone(self.estado.get('a'))
+        self.assertTrue(self.estado.set('a', 1))
+        self.assertEqual(self.estado.get('a'), '1')
+        self.assertTrue(self.estado.set('a', 'dois'))
+        self.assertEqual(self.estado.get('a'), 'dois')
+
+    def test_set_nx(self):
+        self.assertTrue(self.estado.set('nx', 1, nx=True))
+        self.assertFalse(self.estado.set('nx', 2, nx=True))
+        self.assertEqual(self.estado.get('nx'), '1')
+
+    def test_set_px_expira(self):
+        self.assertTrue(self.estado.set('px', 1, nx=True, px=50))
+        self.assertFalse(self.estado.set('px', 2, nx=True, px=50))
+        time.sleep(0.1)
+        self.assertIsNone(self.estado.get('px'))
+        self.assertTrue(self.estado.set('px', 3, nx=True, px=50))
+
+    def test_incr(self):
+        self.assertEqual(self.estado.incr('n'), 1)
+        self.assertEqual(self.estado.incr('n'), 2)
+        self.assertEqual(self.estado.incr('n', 10), 12)
+        self.assertEqual(self.estado.get('n'), '12')
+
+    def test_incr_concorrente(self):
+        valores = []
+        lock = threading.Lock()
+
+        def trabalhar():
+            for _ in range(100):
+                valor = self.estado.incr('concorrente')
+                with lock:
+                    valores.append(valor)
+
+        threads = [threading.Thread(target=trabalhar) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(valores), list(range(1, 401)))
+
+    def test_mget(self):
+        self.estado.set('m1', 'x')
+        self.estado.set('m3', 'z')
+        self.assertEqual(self.estado.mget('m1', 'm2', 'm3'), ['x', None, 'z'])
+
+    def test_expire_delete(self):
+        self.assertFalse(self.estado.expire('inexistente', 10))
+        self.estado.set('e', 1)
+        self.assertTrue(self.estado.expire('e', 10))
+        self.assertEqual(self.estado.delete('e', 'inexistente'), 1)
+        self.assertIsNone(self.estado.get('e'))
+
+    def test_maximos_so_sobem(self):
+        self.assertEqual(self.estado.maximos('t'), {})
+        self.assertEqual(self.estado.atualizar_maximos('t', {1: 5, 2: 0}), 2)
+        self.assertEqual(self.estado.atualizar_maximos('t', {1: 3, 2: 7, 3: 1}), 1)
+        self.assertEqual(self.estado.maximos('t'), {'1': 5, '2': 7, '3': 1})
+
+    def test_publish_subscribe(self):
+        recebidas = []
+        chegou = threading.Event()
+
+        def callback(canal, mensagem):
+            recebidas.append((canal, mensagem))
+            chegou.set()
+
+        self.estado.subscribe('canal', callback)
+        # A subscrição RESP é feita numa thread: repetir até ser entregue
+        for _ in range(50):
+            self.estado.publish('canal', 'ola')
+            if chegou.wait(0.1):
+                break
+        self.assertIn(('canal', 'ola'), recebidas)
+        self.estado.unsubscribe('canal', callback)
+
+
+class TestEstadoMemoria(_TestesEstado, unittest.TestCase):
+
+    def setUp(self):
+        self.estado = EstadoMemoria()
+
+
+class TestEstadoRespUnix(_TestesEstado, unittest.TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        url = 'unix://' + os.path.join(self.diretorio, 'estado.sock')
+        self.servidor = ServidorResp(url)
+        self.servidor.iniciar()
+        self.estado = EstadoResp(url)
+
+    def tearDown(self):
+        self.servidor.parar()
+        shutil.rmtree(self.diretorio)
+
+
+class TestEstadoRespTcp(_TestesEstado, unittest.TestCase):
+
+    def setUp(self):
+        self.servidor = ServidorResp('redis://127.0.0.1:0')
+        self.servidor.iniciar()
+        host, porta = self.servidor.endereco
+        self.estado = EstadoResp(f'redis://{host}:{porta}/0')
+
+    def tearDown(self):
+        self.servidor.parar()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Testes do registo de eventos: a mesma bateria com NumPy e em Python puro.
+
+Uso: python -m unittest discover tests  (ou pytest)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import registo_eventos  # noqa: E402
+from registo_eventos import CABECALHO, REGISTO, RegistoEventos  # noqa: E402
+
+
+def voto(id, dia, tipo=1, seq=None):
+    """Tuplo (id, instante, dia, seq, minuto, tipo) para acrescentar_muitos"""
+    return (id, 1700000000 + id, dia, id if seq is None else seq, 600, tipo)
+
+
+class _TestesRegisto:
+    """Bateria comum; as subclasses escolhem o caminho (NumPy ou Python puro)"""
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.diretorio)
+
+    def registo(self, registos_por_segmento=1000):
+        registo = RegistoEventos(self.diretorio, registos_por_segmento)
+        self.addCleanup(registo.fechar)
+        return registo
+
+    def test_vazio(self):
+        registo = self.registo()
+        self.assertEqual(registo.ultimo_id(), 0)
+        self.assertEqual(registo.totais_diarios(), {})
+
+    def test_totais_diarios(self):
+        registo = self.registo()
+        registo.acrescentar_muitos([voto(1, 100, 1), voto(2, 100, 2), voto(3, 100, 1), voto(4, 101, 3, seq=1)])
+        self.assertEqual(registo.totais_diarios(), {(100, 1): [2, 3], (100, 2): [1, 2], (101, 3): [1, 1]})
+        self.assertEqual(registo.totais_diarios(101, 101), {(101, 3): [1, 1]})
+        self.assertEqual(registo.ultimo_id(), 4)
+
+    def test_intervalo_numa_lacuna(self):
+        registo = self.registo()
+        registo.acrescentar_muitos([voto(1, 100), voto(2, 110)])
+        self.assertEqual(registo.totais_diarios(104, 106), {})
+        self.assertEqual(list(registo.lotes(104, 106)), [])
+        self.assertEqual(registo.totais_diarios(100, 110), {(100, 1): [1, 1], (110, 1): [1, 2]})
+
+    def test_dias_intercalados(self):
+        # Vários processos à meia-noite: um voto do dia anterior chega depois
+        registo = self.registo()
+        registo.acrescentar_muitos([voto(1, 100), voto(2, 101), voto(3, 100)])
+        self.assertEqual(registo.totais_diarios(101, 101), {(101, 1): [1, 2]})
+        self.assertEqual(registo.totais_diarios(100, 100), {(100, 1): [2, 3]})
+
+    def test_rotacao_de_segmentos(self):
+        registo = self.registo(registos_por_segmento=3)
+        registo.acrescentar_muitos([voto(i, 100 + i // 2) for i in range(1, 6)])
+        for i in range(6, 8):
+            registo.acrescentar(i, 1700000000 + i, 100 + i // 2, 600, 1, i)
+        self.assertEqual(registo.segmentos(), [1, 2, 3])
+        # Os segmentos fechados ficam com índice gravado
+        for numero in (1, 2):
+            self.assertTrue(os.path.exists(os.path.join(self.diretorio, f'votos-{numero:06d}.idx')))
+        self.assertEqual(registo.indice(2)['id_min'], 4)
+        self.assertEqual(registo.indice(2)['id_max'], 6)
+        self.assertEqual(registo.ultimo_id(), 7)
+        # Um dia repartido por dois segmentos soma as duas partes
+        self.assertEqual(registo.totais_diarios(102, 103), {(102, 1): [2, 5], (103, 1): [2, 7]})
+        self.assertEqual(sum(v for v, _ in registo.totais_diarios().values()), 7)
+
+    def test_outro_escritor_continua_o_segmento(self):
+        self.registo(registos_por_segmento=3).acrescentar_muitos([voto(1, 100), voto(2, 100)])
+        segundo = self.registo(registos_por_segmento=3)
+        segundo.acrescentar_muitos([voto(3, 100), voto(4, 100)])
+        self.assertEqual(segundo.segmentos(), [1, 2])
+        self.assertEqual(segundo.totais_diarios(), {(100, 1): [4, 4]})
+
+    def test_ultimo_registo_incompleto(self):
+        registo = self.registo()
+        registo.acrescentar_muitos([voto(1, 100), voto(2, 100)])
+        registo.fechar()
+        caminho = os.path.join(self.diretorio, 'votos-000001.seg')
+        # Processo morto a meio de uma escrita: só parte do registo chegou ao disco
+        with open(caminho, 'ab') as f:
+            f.write(REGISTO.pack(*voto(3, 100))[:10])
+
+        leitor = self.registo()
+        self.assertEqual(leitor.ultimo_id(), 2)
+        self.assertEqual(leitor.totais_diarios(), {(100, 1): [2, 2]})
+
+        # A escrita seguinte descarta os bytes soltos antes de acrescentar
+        leitor.acrescentar_muitos([voto(3, 100)])
+        self.assertEqual(os.path.getsize(caminho), CABECALHO.size + 3 * REGISTO.size)
+        self.assertEqual(leitor.ultimo_id(), 3)
+        self.assertEqual(leitor.totais_diarios(), {(100, 1): [3, 3]})
+
+
+@unittest.skipIf(registo_eventos.np is None, 'NumPy não instalado')
+class TestRegistoNumpy(_TestesRegisto, unittest.TestCase):
+    pass
+
+
+class TestRegistoPython(_TestesRegisto, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self._np = registo_eventos.np
+        registo_eventos.np = None
+
+    def tearDown(self):
+        registo_eventos.np = self._np
+        super().tearDown()
+
+
+if __name__ == '__main__':
+    unittest.main()